@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк подписи и хеширования из starknet.py.
+
+Все векторы фиксированы (chain id, ключи, сообщения), поэтому прогоны можно сравнивать
+между собой. Перед замерами хеши PrecompiledTypedData сверяются с эталонным
+TypedData.message_hash на этих векторах: расхождение означает сломанные подписи, и
+бенчмарк останавливается. Результаты печатаются и дописываются в bench_output.txt.
+
+Запуск:
+    python bench_starknet.py [--iterations 200] [--batch-size 32] [--workers 4]
+"""
+import argparse
+import asyncio
+import logging
+import platform
+import statistics
+import time
+
+from starknet_py.common import int_from_bytes
+from starknet_py.utils.typed_data import TypedData
+
+import starknet
+
+# --- Фиксированные тестовые векторы ---
+CHAIN_ID = "PRIVATE_SN_POTC_SEPOLIA"
+PARADEX_CONFIG = {"starknet_chain_id": CHAIN_ID}
+ACCOUNT_ADDRESS = "0x129f3dc1b8962d8a87abc692424c78fda963ade0e1cd17bf3d1c26f8d41ee7a"
+PRIVATE_KEY = "0x3c1e9550e66958296d11b60f8e8e7a7ad990d07fa65d5f7652c4a6c87d4e3cc"
+TIMESTAMP = 1700000000
+EXPIRATION = TIMESTAMP + 1800
+MSG_HASH = 0x6fb5c4b5a2d1e7b4a3a9e5d3e3c1f0b9c6a5d4e3f2a1b0c9d8e7f6a5b4c3d2e
+ORDER_PARAMS = {
+    "market": "BTC-USD-PERP",
+    "side": "BUY",
+    "type": "MARKET",
+    "size": "12",
+    "price": "0",
+    "signature_timestamp": TIMESTAMP * 1000,
+}
+ORDER_MESSAGE = {
+    "timestamp": str(TIMESTAMP * 1000),
+    "market": "BTC-USD-PERP",
+    "side": "BUY",
+    "orderType": "MARKET",
+    "size": "12",
+    "price": "0",
+}
+
+# Векторы сверки хешеров: несколько chain id, аккаунтов и сообщений
+CHECK_CHAIN_IDS = [CHAIN_ID, "PRIVATE_SN_PARACLEAR_MAINNET"]
+CHECK_ACCOUNTS = [ACCOUNT_ADDRESS, "0x4c1d6a3f0e2b7a9158c6d3e2f1a0b9c8d7e6f5a4b3c2d1e0f9a8b7c6d5e4f3a"]
+CHECK_ORDERS = [
+    ORDER_PARAMS,
+    dict(ORDER_PARAMS, side="SELL", size="0.001", signature_timestamp=TIMESTAMP * 1000 + 1),
+    dict(ORDER_PARAMS, market="ETH-USD-PERP", type="LIMIT", size="1.25", price="3200.5"),
+]
+
+OUTPUT_FILE = "bench_output.txt"
+
+
+def percentile(sorted_samples: list[float], fraction: float) -> float:
+    index = min(len(sorted_samples) - 1, int(round(fraction * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def summarize(name: str, samples: list[float], ops_per_sample: int = 1) -> dict:
+    """samples - длительности в секундах; ops_per_sample - сколько подписей в одном замере."""
+    ordered = sorted(samples)
+    total = sum(samples)
+    return {
+        "name": name,
+        "ops": len(samples) * ops_per_sample,
+        "ops_per_sec": len(samples) * ops_per_sample / total if total else 0.0,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "mean_ms": statistics.fmean(samples) * 1000,
+    }
+
+
+def bench_sync(name: str, func, iterations: int) -> dict:
+    func()  # прогрев (кеши хешеров, импорт и т.п.)
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return summarize(name, samples)
+
+
+async def bench_async(name: str, make_coro, iterations: int, ops_per_sample: int = 1) -> dict:
+    await make_coro()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await make_coro()
+        samples.append(time.perf_counter() - started)
+    return summarize(name, samples, ops_per_sample)
+
+
+def full_typed_data_hash(primary_type: str, message: dict, chain_id: str = CHAIN_ID, account_address: str = ACCOUNT_ADDRESS) -> int:
+    """Старый путь: словарь -> TypedData.from_dict -> message_hash."""
+    typed_data = TypedData.from_dict(starknet.build_typed_data(primary_type, int_from_bytes(chain_id.encode()), message))
+    return typed_data.message_hash(int(account_address, 16))
+
+
+def check_hashers() -> int:
+    """Сверяет PrecompiledTypedData с TypedData.message_hash на фиксированных векторах; возвращает число сверок."""
+    messages = [("Request", starknet.build_auth_message(TIMESTAMP, EXPIRATION))]
+    messages += [("Order", starknet.build_order_message(order_params)) for order_params in CHECK_ORDERS]
+    checked = 0
+    for chain_id in CHECK_CHAIN_IDS:
+        for account_address in CHECK_ACCOUNTS:
+            for primary_type, message in messages:
+                expected = full_typed_data_hash(primary_type, message, chain_id, account_address)
+                actual = starknet.get_typed_data_hasher(primary_type, chain_id, account_address).message_hash(message)
+                assert actual == expected, (
+                    f"PrecompiledTypedData расходится с TypedData ({primary_type}, {chain_id}, {account_address}): "
+                    f"{hex(actual)} != {hex(expected)}"
+                )
+                checked += 1
+    return checked
+
+
+def run_sync_benchmarks(iterations: int) -> list[dict]:
+    logging.warning("Хеши PrecompiledTypedData совпадают с TypedData.message_hash: %d векторов.", check_hashers())
+    auth_message = {"method": "POST", "path": "/v1/auth", "body": "", "timestamp": TIMESTAMP, "expiration": EXPIRATION}
+    order_hasher = starknet.get_typed_data_hasher("Order", CHAIN_ID, ACCOUNT_ADDRESS)
+    priv_key = int(PRIVATE_KEY, 16)
+    return [
+        bench_sync("TypedData.message_hash (auth)", lambda: full_typed_data_hash("Request", auth_message), iterations),
+        bench_sync("TypedData.message_hash (order)", lambda: full_typed_data_hash("Order", ORDER_MESSAGE), iterations),
+        bench_sync("PrecompiledTypedData.message_hash (order)", lambda: order_hasher.message_hash(ORDER_MESSAGE), iterations),
+        bench_sync("message_signature", lambda: starknet.message_signature(MSG_HASH, priv_key), iterations),
+        bench_sync(
+            "generate_starknet_auth_signature",
+            lambda: starknet.generate_starknet_auth_signature(ACCOUNT_ADDRESS, TIMESTAMP, EXPIRATION, PRIVATE_KEY, PARADEX_CONFIG),
+            iterations,
+        ),
+        bench_sync(
+            "generate_starknet_order_signature",
+            lambda: starknet.generate_starknet_order_signature(dict(ORDER_PARAMS), PRIVATE_KEY, PARADEX_CONFIG, ACCOUNT_ADDRESS),
+            iterations,
+        ),
+    ]
+
+
+async def run_pool_benchmarks(iterations: int, batch_size: int, workers: int) -> list[dict]:
+    results = []
+    order_request = ("order", (ORDER_PARAMS, PRIVATE_KEY, PARADEX_CONFIG, ACCOUNT_ADDRESS))
+    batch = [order_request] * batch_size
+    batch_iterations = max(1, iterations // batch_size)
+    for executor_type in ("thread", "process"):
+        service = starknet.SigningService(executor_type, workers)
+        try:
+            results.append(await bench_async(
+                f"SigningService.sign_order [{executor_type}]",
+                lambda: service.sign_order(ORDER_PARAMS, PRIVATE_KEY, PARADEX_CONFIG, ACCOUNT_ADDRESS),
+                iterations,
+            ))
+            results.append(await bench_async(
+                f"SigningService.sign_batch x{batch_size} [{executor_type}]",
+                lambda: service.sign_batch(batch),
+                batch_iterations,
+                batch_size,
+            ))
+            results.append(await bench_async(
+                f"concurrent sign_order x{batch_size} [{executor_type}]",
+                lambda: asyncio.gather(*(
+                    service.sign_order(ORDER_PARAMS, PRIVATE_KEY, PARADEX_CONFIG, ACCOUNT_ADDRESS) for _ in range(batch_size)
+                )),
+                batch_iterations,
+                batch_size,
+            ))
+        finally:
+            service.shutdown()
+    return results
+
+
+def format_report(results: list[dict], args) -> str:
+    header = (
+        f"=== bench_starknet {time.strftime('%Y-%m-%d %H:%M:%S')} | python {platform.python_version()} | "
+        f"iterations={args.iterations} batch_size={args.batch_size} workers={args.workers} ==="
+    )
+    lines = [header, f"{'benchmark':<48} {'ops':>7} {'ops/sec':>10} {'p50 ms':>9} {'p99 ms':>9} {'mean ms':>9}"]
+    for result in results:
+        lines.append(
+            f"{result['name']:<48} {result['ops']:>7} {result['ops_per_sec']:>10.1f} "
+            f"{result['p50_ms']:>9.3f} {result['p99_ms']:>9.3f} {result['mean_ms']:>9.3f}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк подписи starknet.py")
+    parser.add_argument("--iterations", type=int, default=200, help="число замеров на бенчмарк")
+    parser.add_argument("--batch-size", type=int, default=32, help="размер пачки для batch/pool вариантов")
+    parser.add_argument("--workers", type=int, default=4, help="размер пула подписи")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="файл, в который дописываются результаты")
+    parser.add_argument("--no-pool", action="store_true", help="пропустить бенчмарки пулов")
+    args = parser.parse_args()
+
+    # Логи подписи на INFO искажают замеры
+    logging.basicConfig(level=logging.WARNING)
+
+    results = run_sync_benchmarks(args.iterations)
+    if not args.no_pool:
+        results += asyncio.run(run_pool_benchmarks(args.iterations, args.batch_size, args.workers))
+
+    report = format_report(results, args)
+    print(report, end="")
+    with open(args.output, "a") as f:
+        f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Логирование бота.
+
+- Сообщения форматируются лениво (%-аргументы logging), тяжёлые дампы (JSON тел запросов
+  и ответов) пишутся только на уровне DEBUG и ничего не стоят, когда он выключен.
+- AccountLogger добавляет к записям индекс аккаунта (в тексте и в record.account_index).
+- OrderPayloadBuffer хранит последние N тел ордеров и выгружает их в лог при ошибке.
+Приватные ключи никогда не попадают в лог.
+"""
+import collections
+import json
+import logging
+import time
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+def setup_logging(level="INFO"):
+    """Настраивает корневой логгер; level - имя уровня ("DEBUG", "INFO", ...) или число."""
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+    logging.getLogger().setLevel(level)
+
+
+class LazyJson:
+    """Откладывает json.dumps до момента, когда запись действительно форматируется."""
+    __slots__ = ('value', 'indent')
+
+    def __init__(self, value, indent=None):
+        self.value = value
+        self.indent = indent
+
+    def __str__(self):
+        return json.dumps(self.value, indent=self.indent, ensure_ascii=False, default=str)
+
+
+class AccountLogger(logging.LoggerAdapter):
+    """Логгер с контекстом аккаунта: префикс "Аккаунт N:" и поле account_index в записи."""
+
+    def process(self, msg, kwargs):
+        kwargs.setdefault('extra', {}).update(self.extra)
+        return f"Аккаунт {self.extra['account_index']}: {msg}", kwargs
+
+
+_account_loggers = {}
+
+
+def get_account_logger(account_data) -> AccountLogger:
+    account_index = account_data['account_index']
+    account_logger = _account_loggers.get(account_index)
+    if account_logger is None:
+        account_logger = AccountLogger(logging.getLogger(), {'account_index': account_index})
+        _account_loggers[account_index] = account_logger
+    return account_logger
+
+
+class OrderPayloadBuffer:
+    """Кольцевой буфер последних N тел ордеров. Тела хранятся как есть и форматируются только при выгрузке."""
+
+    def __init__(self, size=0):
+        self.resize(size)
+
+    def resize(self, size):
+        self._payloads = collections.deque(maxlen=size) if size > 0 else None
+
+    def append(self, account_index, payload):
+        if self._payloads is not None:
+            self._payloads.append((time.time(), account_index, payload))
+
+    def flush(self, reason):
+        """Пишет накопленные тела в лог на уровне ERROR и очищает буфер."""
+        if not self._payloads:
+            return
+        logging.error("Последние %d ордеров (%s):", len(self._payloads), reason)
+        while self._payloads:
+            created_at, account_index, payload = self._payloads.popleft()
+            logging.error("  [%s] Аккаунт %s: %s", time.strftime('%H:%M:%S', time.localtime(created_at)), account_index, LazyJson(payload))
+
+
+order_payloads = OrderPayloadBuffer()
+
+
+def configure_order_buffer(size):
+    order_payloads.resize(size)
+    return order_payloads
@@ -0,0 +1,183 @@
+"""
+Запись и воспроизведение HTTP обмена с Paradex ("кассеты") для офлайн бенчмарков.
+
+В режиме записи каждый ответ, полученный через RequestExecutor, дописывается строкой
+JSONL: эндпоинт, метод, путь, аккаунт, тело запроса, статус, тело ответа и время
+ответа. Секреты не сохраняются: заголовки авторизации и подписи не пишутся вовсе,
+поле signature в ордерах заменяется на "<redacted>", а JWT в ответе /auth - на
+неподписанный токен, в котором остались только аккаунт и срок жизни.
+
+В режиме воспроизведения ответы выдаются из кассеты в порядке записи отдельно для
+каждой пары (метод + путь, аккаунт) с исходной задержкой, сеть не используется.
+Если бот сделал больше запросов, чем записано (другие случайные размеры ордеров,
+другой порядок повторов), повторяется последний успешный ответ для той же пары.
+"""
+import asyncio
+import collections
+import contextlib
+import json
+import logging
+from urllib.parse import urlencode, urlsplit
+
+import aiohttp
+
+import json_codec
+from clock import SystemClock
+from jwt_cache import jwt_claims, unsigned_jwt
+
+REDACTED = "<redacted>"
+
+
+def redacted_jwt(account_address, ttl_seconds, now):
+    """Неподписанный JWT с аккаунтом (sub) и сроком жизни; вместо подписи - REDACTED."""
+    return unsigned_jwt({'sub': account_address, 'exp': int(now + ttl_seconds)}, REDACTED)
+
+
+def _bearer(headers):
+    return (headers or {}).get('Authorization', '').removeprefix('Bearer ') or None
+
+
+def _request_path(url, params=None):
+    parts = urlsplit(str(url))
+    query = "&".join(part for part in (parts.query, urlencode(params or {})) if part)
+    return parts.path + (f"?{query}" if query else "")
+
+
+def _redact_order(order):
+    if isinstance(order, dict) and 'signature' in order:
+        return dict(order, signature=REDACTED)
+    return order
+
+
+class CassetteRecorder:
+    """
+    Параметры:
+      - path: файл кассеты (JSONL), перезаписывается
+      - clock: часы, по которым считается срок жизни JWT
+    """
+
+    def __init__(self, path, clock=None):
+        self.path = path
+        self.clock = clock or SystemClock()
+        self._accounts_by_token = {}
+        self._file = open(path, 'w')
+        self.recorded = 0
+
+    def _account(self, headers):
+        headers = headers or {}
+        return headers.get('PARADEX-STARKNET-ACCOUNT') or self._accounts_by_token.get(_bearer(headers))
+
+    def record(self, endpoint, method, url, request_kwargs, status, response_headers, raw_body, elapsed_seconds):
+        headers = request_kwargs.get('headers')
+        account = self._account(headers)
+        body = raw_body.decode('utf-8', 'replace')
+        jwt_ttl = None
+        if endpoint == 'auth' and status < 400:
+            # Настоящий токен не пишется: кассета хранит только его срок жизни
+            response = json_codec.loads(raw_body) or {}
+            jwt_token = response.get('jwt_token')
+            if jwt_token:
+                self._accounts_by_token[jwt_token] = account
+                exp = (jwt_claims(jwt_token) or {}).get('exp')
+                jwt_ttl = exp - self.clock.time() if exp else None
+                body = json_codec.dumps(dict(response, jwt_token=REDACTED)).decode()
+
+        request_body = None
+        if request_kwargs.get('data'):
+            request_body = json_codec.loads(request_kwargs['data'])
+            request_body = [_redact_order(order) for order in request_body] if isinstance(request_body, list) else _redact_order(request_body)
+
+        entry = {
+            'endpoint': endpoint,
+            'method': method,
+            'path': _request_path(url, request_kwargs.get('params')),
+            'account': account,
+            'request': request_body,
+            'status': status,
+            'retry_after': response_headers.get('Retry-After'),
+            'elapsed_ms': round(elapsed_seconds * 1000, 3),
+            'response': body,
+        }
+        if jwt_ttl is not None:
+            entry['jwt_ttl'] = jwt_ttl
+        self._file.write(json_codec.dumps({key: value for key, value in entry.items() if value is not None}).decode() + '\n')
+        self.recorded += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+            logging.info(f"Записано HTTP обменов в кассету '{self.path}': {self.recorded}")
+
+
+class _ReplayResponse:
+    def __init__(self, entry):
+        self.status = entry['status']
+        self.headers = {'Retry-After': entry['retry_after']} if entry.get('retry_after') else {}
+        self._body = entry['response'].encode()
+
+    async def read(self):
+        return self._body
+
+
+class CassettePlayer:
+    """
+    Параметры:
+      - path: файл кассеты (JSONL)
+      - clock: часы, от которых отсчитывается срок жизни выдаваемых JWT
+      - speed: во сколько раз быстрее исходного воспроизводить задержки ответов (0 - без задержек)
+    """
+
+    def __init__(self, path, clock=None, speed=1.0):
+        self.path = path
+        self.clock = clock or SystemClock()
+        self.speed = speed
+        self._entries = collections.defaultdict(collections.deque)
+        self._last_ok = {}
+        self.accounts = []
+        with open(path, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json_codec.loads(line)
+                self._entries[(entry['method'], entry['path'], entry.get('account'))].append(entry)
+                if entry.get('account') and entry['account'] not in self.accounts:
+                    self.accounts.append(entry['account'])
+        self.replayed = 0
+        self.reused = 0
+
+    def _account(self, headers):
+        headers = headers or {}
+        account = headers.get('PARADEX-STARKNET-ACCOUNT')
+        if account is None and _bearer(headers):
+            account = (jwt_claims(_bearer(headers)) or {}).get('sub')
+        return account
+
+    def remaining(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+    @contextlib.asynccontextmanager
+    async def request(self, method, url, headers=None, params=None, **kwargs):
+        """Замена session.request(): ответ берётся из кассеты."""
+        yield await self._next_response(method, _request_path(url, params), headers)
+
+    async def _next_response(self, method, path, headers):
+        account = self._account(headers)
+        key = (method, path, account)
+        entries = self._entries.get(key)
+        if entries:
+            entry = entries.popleft()
+            if entry['status'] < 400:
+                self._last_ok[key] = entry
+        elif key in self._last_ok:
+            entry = self._last_ok[key]
+            self.reused += 1
+        else:
+            raise aiohttp.ClientConnectionError(f"в кассете нет ответа на {method} {path} (аккаунт {account})")
+        if self.speed:
+            await asyncio.sleep(entry['elapsed_ms'] / 1000 / self.speed)
+        if 'jwt_ttl' in entry:
+            response = json_codec.loads(entry['response'])
+            response['jwt_token'] = redacted_jwt(account, entry['jwt_ttl'], self.clock.time())
+            entry = dict(entry, response=json_codec.dumps(response).decode())
+        self.replayed += 1
+        return _ReplayResponse(entry)
@@ -0,0 +1,106 @@
+"""
+Часы бота: время и ожидание через один объект, чтобы их можно было подменить.
+
+SystemClock - обычные time.time()/asyncio.sleep().
+VirtualClock - виртуальное время для симуляции: sleep() не ждёт реально, а часы
+перескакивают к ближайшему дедлайну, как только все задачи ждут (и нет незавершённых
+операций, отмеченных через busy()).
+"""
+import asyncio
+import contextlib
+import heapq
+import itertools
+import time
+
+
+class SystemClock:
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(seconds)
+
+    def busy(self):
+        """Отмечает реальную операцию (HTTP запрос и т.п.); для системных часов ничего не делает."""
+        return contextlib.nullcontext()
+
+
+class VirtualClock:
+    """
+    Параметры:
+      - start: начальное виртуальное время (unix-время), по умолчанию текущее
+      - settle_seconds: сколько реального времени ждать простоя перед прыжком часов
+    """
+
+    def __init__(self, start=None, settle_seconds=0.0005):
+        self._now = time.time() if start is None else start
+        self._start = self._now
+        self.settle_seconds = settle_seconds
+        self._sleepers = []
+        self._counter = itertools.count()
+        self._busy = 0
+        self._idle = None
+        self._driver = None
+
+    def time(self):
+        return self._now
+
+    def monotonic(self):
+        return self._now - self._start
+
+    @property
+    def elapsed(self):
+        return self._now - self._start
+
+    async def sleep(self, seconds):
+        if seconds <= 0:
+            await asyncio.sleep(0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._sleepers, (self._now + seconds, next(self._counter), future))
+        self._ensure_driver()
+        await future
+
+    @contextlib.contextmanager
+    def busy(self):
+        """Пока операция не завершена, виртуальные часы стоят."""
+        self._ensure_idle_event().clear()
+        self._busy += 1
+        try:
+            yield
+        finally:
+            self._busy -= 1
+            if self._busy == 0:
+                self._idle.set()
+
+    def _ensure_idle_event(self):
+        if self._idle is None:
+            self._idle = asyncio.Event()
+            self._idle.set()
+        return self._idle
+
+    def _ensure_driver(self):
+        if self._driver is None or self._driver.done():
+            self._driver = asyncio.create_task(self._drive())
+
+    async def _drive(self):
+        idle = self._ensure_idle_event()
+        while self._sleepers:
+            # Даём разбуженным задачам дойти до следующего ожидания
+            await asyncio.sleep(self.settle_seconds)
+            if self._busy:
+                await idle.wait()
+                continue
+            deadline, _, future = heapq.heappop(self._sleepers)
+            if future.done():
+                continue
+            self._now = max(self._now, deadline)
+            future.set_result(None)
+            # Все, кто должен проснуться в тот же момент, просыпаются вместе
+            while self._sleepers and self._sleepers[0][0] <= self._now:
+                _, _, future = heapq.heappop(self._sleepers)
+                if not future.done():
+                    future.set_result(None)
@@ -0,0 +1,60 @@
+"""
+Долгоживущие HTTP сессии: одна aiohttp.ClientSession со своим коннектором на аккаунт
+на всё время работы бота. Соединения (TCP+TLS, в том числе туннели через прокси)
+переиспользуются между циклами, DNS кешируется.
+"""
+import logging
+
+import aiohttp
+
+PUBLIC_SESSION_KEY = 'public'
+
+
+class SessionManager:
+    """
+    Параметры:
+      - connection_limit: максимум одновременных соединений на сессию
+      - keepalive_seconds: сколько держать простаивающее соединение
+      - dns_cache_seconds: TTL кеша DNS
+    """
+
+    def __init__(self, connection_limit=10, keepalive_seconds=75, dns_cache_seconds=300):
+        self.connection_limit = connection_limit
+        self.keepalive_seconds = keepalive_seconds
+        self.dns_cache_seconds = dns_cache_seconds
+        self._sessions = {}
+
+    def _create_session(self, headers):
+        connector = aiohttp.TCPConnector(
+            limit=self.connection_limit,
+            keepalive_timeout=self.keepalive_seconds,
+            ttl_dns_cache=self.dns_cache_seconds,
+            enable_cleanup_closed=True,
+        )
+        return aiohttp.ClientSession(connector=connector, headers=headers)
+
+    def get(self, key, headers=None):
+        """Возвращает сессию по ключу, создавая её при первом обращении."""
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            session = self._create_session(headers)
+            self._sessions[key] = session
+        return session
+
+    def for_account(self, account_data):
+        headers = {
+            'User-Agent': account_data['user_agent'] if account_data['user_agent'] else 'ParadexBot-Default-UA'
+        }
+        return self.get(account_data['account_index'], headers)
+
+    def public(self):
+        """Сессия для публичных запросов без привязки к аккаунту (system/config и т.п.)."""
+        return self.get(PUBLIC_SESSION_KEY)
+
+    async def close(self):
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for session in sessions:
+            if not session.closed:
+                await session.close()
+        logging.info("Закрыто HTTP сессий: %d", len(sessions))
@@ -0,0 +1,36 @@
+"""
+JSON кодек для HTTP запросов и ответов: orjson, если установлен, иначе stdlib json.
+
+dumps() сразу возвращает bytes (тело запроса без промежуточной строки), loads()
+разбирает тело ответа из bytes за один проход. Значения, которые orjson не
+поддерживает (например, целые больше 64 бит), обрабатываются stdlib json.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_CONTENT_TYPE = 'application/json'
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def loads(data):
+    """Разбирает bytes или str; пустое тело -> None (как aiohttp response.json())."""
+    if not data or not data.strip():
+        return None
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
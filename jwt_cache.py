@@ -0,0 +1,134 @@
+"""
+Кеш JWT токенов по аккаунтам.
+
+Токен переиспользуется между циклами, пока он действителен, и обновляется в фоне
+за refresh_margin_seconds до истечения. При 401 токен сбрасывается и запрос
+повторяется один раз с новым токеном.
+"""
+import asyncio
+import base64
+import json
+import logging
+
+from clock import SystemClock
+
+
+class AuthExpiredError(Exception):
+    """API ответил 401: токен просрочен или отозван."""
+
+
+def jwt_claims(jwt_token):
+    """Возвращает payload JWT (без проверки подписи) или None, если токен не разбирается."""
+    try:
+        payload = jwt_token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+    except (AttributeError, IndexError, TypeError, ValueError):
+        return None
+    return claims if isinstance(claims, dict) else None
+
+
+def unsigned_jwt(claims, signature):
+    """JWT без настоящей подписи (alg none) с payload claims; signature - произвольная метка вместо подписи."""
+    def b64(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip('=')
+    return f"{b64({'alg': 'none', 'typ': 'JWT'})}.{b64(claims)}.{signature}"
+
+
+def jwt_expiration(jwt_token):
+    """Возвращает claim exp (unix-время в секундах) или None, если токен не разбирается."""
+    try:
+        return float(jwt_claims(jwt_token)['exp'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class JwtTokenCache:
+    """
+    Параметры:
+      - fetch_token: корутина fetch_token(account_data, session) -> jwt_token | None
+      - refresh_margin_seconds: за сколько секунд до истечения обновлять токен
+      - token_lifetime_seconds: срок жизни, если в токене нет exp
+      - clock: часы (см. clock.py)
+    """
+
+    def __init__(self, fetch_token, refresh_margin_seconds=120, token_lifetime_seconds=1800, clock=None):
+        self.clock = clock or SystemClock()
+        self._fetch_token = fetch_token
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.token_lifetime_seconds = token_lifetime_seconds
+        self._tokens = {}  # account_index -> (jwt_token, expires_at)
+        self._locks = {}
+        self._refresh_tasks = {}
+
+    def _is_fresh(self, entry):
+        return entry is not None and entry[1] - self.refresh_margin_seconds > self.clock.time()
+
+    async def get(self, account_data, session=None):
+        """Возвращает действующий токен аккаунта, при необходимости получает новый."""
+        account_index = account_data['account_index']
+        entry = self._tokens.get(account_index)
+        if self._is_fresh(entry):
+            return entry[0]
+        lock = self._locks.setdefault(account_index, asyncio.Lock())
+        async with lock:
+            # Пока ждали блокировку, токен мог обновить другой запрос
+            entry = self._tokens.get(account_index)
+            if self._is_fresh(entry):
+                return entry[0]
+            return await self._fetch_and_store(account_data, session)
+
+    async def _fetch_and_store(self, account_data, session):
+        jwt_token = await self._fetch_token(account_data, session)
+        if not jwt_token:
+            return None
+        expires_at = jwt_expiration(jwt_token) or self.clock.time() + self.token_lifetime_seconds
+        account_index = account_data['account_index']
+        self._tokens[account_index] = (jwt_token, expires_at)
+        self._schedule_refresh(account_data, expires_at)
+        return jwt_token
+
+    def _schedule_refresh(self, account_data, expires_at):
+        account_index = account_data['account_index']
+        task = self._refresh_tasks.get(account_index)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        self._refresh_tasks[account_index] = asyncio.create_task(self._refresh_later(account_data, expires_at))
+
+    async def _refresh_later(self, account_data, expires_at):
+        await self.clock.sleep(max(0.0, expires_at - self.refresh_margin_seconds - self.clock.time()))
+        account_index = account_data['account_index']
+        logging.info("Аккаунт %s: Фоновое обновление JWT токена.", account_index)
+        try:
+            async with self._locks.setdefault(account_index, asyncio.Lock()):
+                await self._fetch_and_store(account_data, None)
+        except Exception as e:
+            logging.error("Аккаунт %s: Ошибка фонового обновления JWT токена: %s", account_index, e)
+
+    def invalidate(self, account_data):
+        self._tokens.pop(account_data['account_index'], None)
+
+    async def call(self, account_data, request, session=None):
+        """
+        Выполняет request(jwt_token). Если API ответил 401 (AuthExpiredError),
+        сбрасывает токен, получает новый и повторяет запрос один раз.
+        """
+        jwt_token = await self.get(account_data, session)
+        if not jwt_token:
+            return None
+        try:
+            return await request(jwt_token)
+        except AuthExpiredError:
+            logging.warning("Аккаунт %s: JWT токен отклонён (401), повторная аутентификация.", account_data['account_index'])
+            self.invalidate(account_data)
+            jwt_token = await self.get(account_data, session)
+            if not jwt_token:
+                return None
+            return await request(jwt_token)
+
+    async def close(self):
+        tasks = list(self._refresh_tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._refresh_tasks.clear()
@@ -0,0 +1,145 @@
+"""
+Кеш метаданных рынков (/v1/markets) и mark price (/v1/markets/summary).
+
+Для каждого рынка заранее считается MarketQuantizer: шаг размера и минимальный
+notional переводятся в целые числа в единицах felt (10^-8), после чего
+пересчёт notional -> размер ордера и его подписываемое представление выполняются
+целочисленной арифметикой, без float. Метаданные перезагружаются раз в ttl_seconds,
+mark price - раз в price_ttl_seconds; на каждый ордер ничего не запрашивается.
+"""
+import asyncio
+import logging
+from decimal import ROUND_FLOOR, Decimal, InvalidOperation
+
+from clock import SystemClock
+
+FELT_DECIMALS = 8
+
+
+def to_felt_amount(value, decimals=FELT_DECIMALS) -> int:
+    """Размер или цена (строка/Decimal) -> целое число в единицах 10^-decimals. Лишние знаки - ValueError."""
+    try:
+        scaled = Decimal(value).scaleb(decimals)
+    except InvalidOperation:
+        raise ValueError(f"Некорректное число: {value!r}")
+    if scaled != scaled.to_integral_value():
+        raise ValueError(f"{value} не представимо с точностью 1e-{decimals}")
+    return int(scaled)
+
+
+def from_felt_amount(amount: int, decimals=FELT_DECIMALS) -> str:
+    """Обратное преобразование: целое в единицах 10^-decimals -> строка без экспоненты и лишних нулей."""
+    text = format(Decimal(amount).scaleb(-decimals), 'f')
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    return text
+
+
+class MarketQuantizer:
+    """Округление размера ордера под параметры одного рынка (значения из ответа /v1/markets)."""
+
+    def __init__(self, market, decimals=FELT_DECIMALS):
+        self.symbol = market['symbol']
+        self.decimals = decimals
+        self.scale = 10 ** decimals
+        self.size_step = to_felt_amount(market.get('order_size_increment') or '1', decimals)
+        self.min_notional = Decimal(market.get('min_notional') or 0)
+        max_order_size = market.get('max_order_size')
+        self.max_size = to_felt_amount(max_order_size, decimals) if max_order_size else None
+
+    def floor_size(self, size) -> int:
+        """Размер -> кратное шагу размера (вниз), в единицах felt."""
+        size_felt = int(Decimal(size).scaleb(self.decimals).to_integral_value(ROUND_FLOOR))
+        size_felt -= size_felt % self.size_step
+        if self.max_size is not None:
+            size_felt = min(size_felt, self.max_size - self.max_size % self.size_step)
+        return size_felt
+
+    def size_for_notional(self, notional, price):
+        """
+        Размер ордера на notional (в USD) по цене price: строка для API или None, если после
+        округления вниз ордер меньше минимального notional рынка.
+        """
+        price = Decimal(price)
+        if price <= 0:
+            return None
+        size_felt = self.floor_size(Decimal(notional) / price)
+        if size_felt <= 0 or Decimal(size_felt) * price < self.min_notional * self.scale:
+            return None
+        return from_felt_amount(size_felt, self.decimals)
+
+
+class MarketCache:
+    """
+    Параметры:
+      - fetch_markets: корутина без аргументов -> ответ /v1/markets или None
+      - fetch_summary: корутина без аргументов -> ответ /v1/markets/summary?market=ALL или None
+      - ttl_seconds: как часто перезагружать метаданные рынков
+      - price_ttl_seconds: как часто обновлять mark price
+    При ошибке загрузки используются последние успешно загруженные данные.
+    """
+
+    def __init__(self, fetch_markets, fetch_summary, ttl_seconds=3600, price_ttl_seconds=30, clock=None, decimals=FELT_DECIMALS):
+        self.fetch_markets = fetch_markets
+        self.fetch_summary = fetch_summary
+        self.ttl_seconds = ttl_seconds
+        self.price_ttl_seconds = price_ttl_seconds
+        self.clock = clock or SystemClock()
+        self.decimals = decimals
+        self._quantizers = {}
+        self._mark_prices = {}
+        self._markets_loaded_at = None
+        self._prices_loaded_at = None
+        self._lock = asyncio.Lock()
+
+    def _expired(self, loaded_at, ttl):
+        return loaded_at is None or self.clock.monotonic() - loaded_at >= ttl
+
+    async def _refresh_markets(self):
+        response = await self.fetch_markets()
+        if not response:
+            if self._quantizers:
+                # Прежние данные остаются в силе до следующей перезагрузки
+                logging.warning("Не удалось загрузить метаданные рынков, используются прежние.")
+                self._markets_loaded_at = self.clock.monotonic()
+            return
+        quantizers = {}
+        for market in response.get('results', []):
+            try:
+                quantizers[market['symbol']] = MarketQuantizer(market, self.decimals)
+            except (KeyError, ValueError) as e:
+                logging.warning(f"Пропущен рынок с некорректными параметрами {market.get('symbol')}: {e}")
+        self._quantizers = quantizers
+        self._markets_loaded_at = self.clock.monotonic()
+        logging.info(f"Метаданные рынков загружены: {len(quantizers)} рынков.")
+
+    async def _refresh_prices(self):
+        response = await self.fetch_summary()
+        if not response:
+            if self._mark_prices:
+                logging.warning("Не удалось загрузить mark price рынков, используются прежние.")
+                self._prices_loaded_at = self.clock.monotonic()
+            return
+        mark_prices = {}
+        for summary in response.get('results', []):
+            if summary.get('mark_price'):
+                mark_prices[summary['symbol']] = Decimal(summary['mark_price'])
+        self._mark_prices = mark_prices
+        self._prices_loaded_at = self.clock.monotonic()
+
+    async def quantizer(self, symbol):
+        """MarketQuantizer рынка или None, если рынок неизвестен."""
+        if self._expired(self._markets_loaded_at, self.ttl_seconds):
+            # Одна загрузка на все аккаунты: остальные ждут её результата
+            async with self._lock:
+                if self._expired(self._markets_loaded_at, self.ttl_seconds):
+                    await self._refresh_markets()
+        return self._quantizers.get(symbol)
+
+    async def mark_price(self, symbol):
+        """Mark price рынка (Decimal) или None."""
+        if self._expired(self._prices_loaded_at, self.price_ttl_seconds):
+            async with self._lock:
+                if self._expired(self._prices_loaded_at, self.price_ttl_seconds):
+                    await self._refresh_prices()
+        return self._mark_prices.get(symbol)
@@ -0,0 +1,156 @@
+"""
+Метрики бота: гистограммы задержек HTTP запросов по эндпоинтам, счётчики статусов
+и повторов, длительности подписи.
+
+Экспорт: текст в формате Prometheus (HTTP эндпоинт /metrics), периодический JSON
+снимок в файл и сводка в лог в конце работы. Длительности меряются реальным
+временем (time.perf_counter), в том числе в симуляции.
+"""
+import json
+import logging
+import os
+
+from aiohttp import web
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последний - больше максимальной границы
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, fraction):
+        """Оценка квантиля по корзинам (линейная интерполяция внутри корзины)."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        lower = 0.0
+        for index, bucket_count in enumerate(self.counts):
+            upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+            if seen + bucket_count >= rank and bucket_count:
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+            lower = upper
+        return self.buckets[-1]
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.request_latency = {}  # эндпоинт -> Histogram
+        self.status_counts = {}  # (эндпоинт, статус) -> число ответов; статус "transport" - сетевая ошибка
+        self.retries = {}  # эндпоинт -> число повторов
+        self.signing = {}  # "auth" | "order" | "batch" -> Histogram
+
+    def observe_request(self, endpoint, seconds, status):
+        histogram = self.request_latency.get(endpoint)
+        if histogram is None:
+            histogram = self.request_latency[endpoint] = Histogram()
+        histogram.observe(seconds)
+        key = (endpoint, str(status))
+        self.status_counts[key] = self.status_counts.get(key, 0) + 1
+
+    def record_retry(self, endpoint):
+        self.retries[endpoint] = self.retries.get(endpoint, 0) + 1
+
+    def observe_signing(self, kind, seconds):
+        histogram = self.signing.get(kind)
+        if histogram is None:
+            histogram = self.signing[kind] = Histogram()
+        histogram.observe(seconds)
+
+    def snapshot(self):
+        return {
+            'requests': {endpoint: histogram.snapshot() for endpoint, histogram in self.request_latency.items()},
+            'statuses': {f"{endpoint} {status}": count for (endpoint, status), count in self.status_counts.items()},
+            'retries': dict(self.retries),
+            'signing': {kind: histogram.snapshot() for kind, histogram in self.signing.items()},
+        }
+
+    def prometheus_text(self):
+        lines = []
+
+        def histogram_lines(name, label, histograms):
+            lines.append(f"# TYPE {name} histogram")
+            for value, histogram in sorted(histograms.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{{label}="{value}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{label}="{value}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{{label}="{value}"}} {histogram.sum}')
+                lines.append(f'{name}_count{{{label}="{value}"}} {histogram.count}')
+
+        histogram_lines("paradex_request_duration_seconds", "endpoint", self.request_latency)
+        lines.append("# TYPE paradex_responses_total counter")
+        for (endpoint, status), count in sorted(self.status_counts.items()):
+            lines.append(f'paradex_responses_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+        lines.append("# TYPE paradex_retries_total counter")
+        for endpoint, count in sorted(self.retries.items()):
+            lines.append(f'paradex_retries_total{{endpoint="{endpoint}"}} {count}')
+        histogram_lines("paradex_signing_duration_seconds", "kind", self.signing)
+        return "\n".join(lines) + "\n"
+
+    def log_summary(self):
+        """Сводка за весь прогон (вызывается в конце run_bot)."""
+        logging.info("--- Метрики за прогон ---")
+        for endpoint, histogram in sorted(self.request_latency.items()):
+            stats = histogram.snapshot()
+            statuses = ", ".join(f"{status}: {count}" for (name, status), count in sorted(self.status_counts.items()) if name == endpoint)
+            logging.info(
+                "  %-10s запросов %d, p50 %.0f мс, p99 %.0f мс, повторов %d, статусы: %s",
+                endpoint, stats['count'], stats['p50'] * 1000, stats['p99'] * 1000, self.retries.get(endpoint, 0), statuses,
+            )
+        for kind, histogram in sorted(self.signing.items()):
+            stats = histogram.snapshot()
+            logging.info("  подпись %-6s %d шт., среднее %.1f мс, p99 %.1f мс", kind, stats['count'], stats['mean'] * 1000, stats['p99'] * 1000)
+
+
+async def start_metrics_server(metrics, host='127.0.0.1', port=9100):
+    """HTTP эндпоинт /metrics в формате Prometheus. Остановка - await runner.cleanup()."""
+    async def handle(request):
+        return web.Response(text=metrics.prometheus_text(), content_type='text/plain')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info(f"Метрики доступны на http://{host}:{port}/metrics")
+    return runner
+
+
+def write_snapshot(metrics, path):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(metrics.snapshot(), f, indent=2)
+    os.replace(tmp_path, path)
+
+
+async def write_snapshots_periodically(metrics, path, interval_seconds, clock):
+    while True:
+        await clock.sleep(interval_seconds)
+        try:
+            write_snapshot(metrics, path)
+        except OSError as e:
+            logging.warning(f"Не удалось записать снимок метрик в '{path}': {e}")
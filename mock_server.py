@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Локальный заменитель Paradex API для офлайн нагрузочного тестирования.
+
+Реализует /v1/system/config, /v1/system/time, /v1/markets, /v1/markets/summary, /v1/auth, /v1/account,
+/v1/orders, /v1/orders/batch и /v1/positions.
+Подписи auth и ордеров проверяются эталонным TypedData из starknet_py, поэтому
+функции starknet.py проверяются от начала до конца. Задержки, доля 5xx ошибок и
+доля ответов 429 настраиваются, случайность детерминирована через seed.
+Часы сервера можно сдвинуть (--clock-skew): метки времени auth и ордеров, отличающиеся
+от них больше чем на timestamp_tolerance_seconds, отклоняются, как на бирже.
+
+Запуск:
+    python mock_server.py --port 8080 --wallets wallets.json --latency-ms 20 80 --error-rate 0.05 --rate-limit-rate 0.05
+и в config.json бота: "api_url": "http://127.0.0.1:8080/v1"
+"""
+import argparse
+import asyncio
+import email.utils
+import json
+import logging
+import random
+import uuid
+from decimal import Decimal
+
+from aiohttp import web
+from starknet_py.common import int_from_bytes
+from starknet_py.hash.utils import private_to_stark_key, verify_message_signature
+from starknet_py.utils.typed_data import TypedData
+
+from clock import SystemClock
+from jwt_cache import unsigned_jwt
+from starknet import build_auth_message, build_order_message, build_typed_data
+
+MOCK_CHAIN_ID = "PRIVATE_SN_POTC_SEPOLIA"
+JWT_LIFETIME_SECONDS = 300
+TIMESTAMP_TOLERANCE_SECONDS = 30
+MOCK_MARKETS = [
+    {'symbol': 'BTC-USD-PERP', 'base_currency': 'BTC', 'quote_currency': 'USD', 'order_size_increment': '0.001',
+     'price_tick_size': '0.1', 'min_notional': '100', 'max_order_size': '100', 'mark_price': '65000'},
+    {'symbol': 'ETH-USD-PERP', 'base_currency': 'ETH', 'quote_currency': 'USD', 'order_size_increment': '0.01',
+     'price_tick_size': '0.01', 'min_notional': '100', 'max_order_size': '1000', 'mark_price': '3200'},
+]
+
+
+class MockParadex:
+    """
+    Параметры:
+      - public_keys: адрес аккаунта -> публичный ключ StarkNet (int); подписи неизвестных
+        аккаунтов отклоняются, если verify_signatures=True
+      - latency_ms: (min, max) искусственная задержка каждого ответа
+      - error_rate: доля ответов 500
+      - rate_limit_rate: доля ответов 429 с Retry-After
+      - free_collateral: free collateral каждого аккаунта
+      - batch_orders: есть ли эндпоинт /v1/orders/batch (без него - 404, как у биржи без пакетных ордеров)
+      - clock: часы для выдачи и проверки токенов и меток времени (задержка ответа всегда реальная)
+      - clock_skew_seconds: на сколько часы сервера опережают clock
+      - timestamp_tolerance_seconds: допустимое расхождение меток времени в подписях с часами сервера
+    """
+
+    def __init__(self, public_keys=None, latency_ms=(0, 0), error_rate=0.0, rate_limit_rate=0.0, retry_after_seconds=1,
+                 free_collateral="10000", verify_signatures=True, seed=None, chain_id=MOCK_CHAIN_ID, clock=None, batch_orders=True,
+                 clock_skew_seconds=0.0, timestamp_tolerance_seconds=TIMESTAMP_TOLERANCE_SECONDS):
+        self.clock = clock or SystemClock()
+        self.clock_skew_seconds = clock_skew_seconds
+        self.timestamp_tolerance_seconds = timestamp_tolerance_seconds
+        self.public_keys = public_keys or {}
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after_seconds = retry_after_seconds
+        self.free_collateral = free_collateral
+        self.batch_orders = batch_orders
+        self.verify_signatures = verify_signatures
+        self.random = random.Random(seed)
+        self.chain_id = chain_id
+        self.tokens = {}  # jwt -> (адрес аккаунта, exp)
+        self.positions = {}  # адрес аккаунта -> рынок -> позиция
+        self.orders = []
+        self.stats = {'requests': 0, 'errors_injected': 0, 'rate_limited': 0, 'bad_signatures': 0, 'bad_timestamps': 0}
+
+    def now(self):
+        """Время сервера (unix-время в секундах)."""
+        return self.clock.time() + self.clock_skew_seconds
+
+    # --- Внедрение сбоев ---
+    @web.middleware
+    async def fault_injection(self, request, handler):
+        self.stats['requests'] += 1
+        low, high = self.latency_ms
+        if high > 0:
+            await asyncio.sleep(self.random.uniform(low, high) / 1000)
+        roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            self.stats['rate_limited'] += 1
+            return web.json_response({'error': 'RATE_LIMIT_EXCEEDED'}, status=429, headers={'Retry-After': str(self.retry_after_seconds)})
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.stats['errors_injected'] += 1
+            return web.json_response({'error': 'INTERNAL_ERROR'}, status=500)
+        return await handler(request)
+
+    async def set_date_header(self, request, response):
+        # aiohttp ставит Date по системным часам; здесь - по часам сервера
+        response.headers['Date'] = email.utils.formatdate(self.now(), usegmt=True)
+
+    # --- Проверки ---
+    def _check_signature(self, account_address, typed_data_dict, signature):
+        if not self.verify_signatures:
+            return True
+        public_key = self.public_keys.get(account_address)
+        if public_key is None:
+            return False
+        msg_hash = TypedData.from_dict(typed_data_dict).message_hash(int(account_address, 16))
+        valid = verify_message_signature(msg_hash, [int(part) for part in signature], public_key)
+        if not valid:
+            self.stats['bad_signatures'] += 1
+        return valid
+
+    def _check_timestamp(self, timestamp):
+        if abs(timestamp - self.now()) <= self.timestamp_tolerance_seconds:
+            return True
+        self.stats['bad_timestamps'] += 1
+        return False
+
+    def _account_from_bearer(self, request):
+        auth_header = request.headers.get('Authorization', '')
+        entry = self.tokens.get(auth_header.removeprefix('Bearer '))
+        if entry is None or entry[1] < self.now():
+            raise web.HTTPUnauthorized(text=json.dumps({'error': 'INVALID_TOKEN'}), content_type='application/json')
+        return entry[0]
+
+    # --- Эндпоинты ---
+    async def system_config(self, request):
+        return web.json_response({
+            'starknet_chain_id': self.chain_id,
+            'block_explorer_url': 'http://127.0.0.1/mock',
+            'paraclear_decimals': 8,
+        })
+
+    async def system_time(self, request):
+        return web.json_response({'server_time': str(int(self.now() * 1000))})
+
+    async def markets(self, request):
+        return web.json_response({'results': [
+            {key: value for key, value in market.items() if key != 'mark_price'} for market in MOCK_MARKETS
+        ]})
+
+    async def markets_summary(self, request):
+        return web.json_response({'results': [
+            {'symbol': market['symbol'], 'mark_price': market['mark_price'], 'created_at': int(self.now() * 1000)}
+            for market in MOCK_MARKETS
+        ]})
+
+    async def auth(self, request):
+        account_address = request.headers.get('PARADEX-STARKNET-ACCOUNT')
+        try:
+            timestamp = int(request.headers['PARADEX-TIMESTAMP'])
+            expiration = int(request.headers['PARADEX-SIGNATURE-EXPIRATION'])
+            signature = json.loads(request.headers['PARADEX-STARKNET-SIGNATURE'])
+        except (KeyError, ValueError):
+            return web.json_response({'error': 'INVALID_REQUEST_HEADERS'}, status=400)
+        if not self._check_timestamp(timestamp):
+            return web.json_response({'error': 'INVALID_TIMESTAMP'}, status=400)
+        if expiration < self.now():
+            return web.json_response({'error': 'SIGNATURE_EXPIRED'}, status=400)
+        typed_data_dict = build_typed_data("Request", int_from_bytes(self.chain_id.encode()), build_auth_message(timestamp, expiration))
+        if not self._check_signature(account_address, typed_data_dict, signature):
+            return web.json_response({'error': 'INVALID_STARKNET_SIGNATURE'}, status=401)
+        expires_at = int(self.now()) + JWT_LIFETIME_SECONDS
+        # Неподписанный JWT: бот читает из него только exp
+        jwt_token = unsigned_jwt({'sub': account_address, 'exp': expires_at, 'jti': uuid.uuid4().hex}, 'mock')
+        self.tokens[jwt_token] = (account_address, expires_at)
+        return web.json_response({'jwt_token': jwt_token})
+
+    async def account(self, request):
+        account_address = self._account_from_bearer(request)
+        return web.json_response({
+            'account': account_address,
+            'status': 'ACTIVE',
+            'free_collateral': self.free_collateral,
+            'account_value': self.free_collateral,
+        })
+
+    def _accept_order(self, account_address, order):
+        """Проверяет подпись и исполняет ордер. Возвращает (ордер, None) или (None, код ошибки)."""
+        try:
+            signature = json.loads(order['signature'])
+            typed_data_dict = build_typed_data("Order", int_from_bytes(self.chain_id.encode()), build_order_message(order))
+        except (KeyError, ValueError, TypeError):
+            return None, 'INVALID_ORDER'
+        if not self._check_timestamp(int(order.get('signature_timestamp') or 0) / 1000):
+            return None, 'INVALID_SIGNATURE_TIMESTAMP'
+        if not self._check_signature(account_address, typed_data_dict, signature):
+            return None, 'INVALID_STARKNET_SIGNATURE'
+        result = self._fill(account_address, order)
+        self.orders.append(result)
+        return result, None
+
+    async def create_order(self, request):
+        account_address = self._account_from_bearer(request)
+        try:
+            order = await request.json()
+        except ValueError:
+            return web.json_response({'error': 'INVALID_ORDER'}, status=400)
+        result, error = self._accept_order(account_address, order)
+        if error:
+            return web.json_response({'error': error}, status=400)
+        return web.json_response(result, status=201)
+
+    async def create_orders_batch(self, request):
+        """Ордера пачки обрабатываются независимо: errors[i] - ошибка i-го ордера или null."""
+        account_address = self._account_from_bearer(request)
+        try:
+            orders = await request.json()
+        except ValueError:
+            return web.json_response({'error': 'INVALID_ORDER'}, status=400)
+        if not isinstance(orders, list) or not orders:
+            return web.json_response({'error': 'INVALID_ORDER'}, status=400)
+        accepted, errors = [], []
+        for order in orders:
+            result, error = self._accept_order(account_address, order) if isinstance(order, dict) else (None, 'INVALID_ORDER')
+            if result is not None:
+                accepted.append(result)
+            errors.append({'error': error} if error else None)
+        return web.json_response({'orders': accepted, 'errors': errors}, status=201)
+
+    def _fill(self, account_address, order):
+        """MARKET ордер исполняется сразу и целиком."""
+        now_ms = int(self.now() * 1000)
+        markets = self.positions.setdefault(account_address, {})
+        position = markets.get(order['market'])
+        signed_size = Decimal(position['size']) * (1 if position['side'] == 'LONG' else -1) if position else Decimal(0)
+        signed_size += Decimal(order['size']) * (1 if order['side'] == 'BUY' else -1)
+        markets[order['market']] = {
+            'id': f"{account_address}-{order['market']}",
+            'market': order['market'],
+            'side': 'LONG' if signed_size >= 0 else 'SHORT',
+            'size': str(abs(signed_size)),
+            'status': 'OPEN' if signed_size else 'CLOSED',
+            'last_updated_at': now_ms,
+        }
+        return {
+            'id': uuid.uuid4().hex,
+            'account': account_address,
+            'market': order['market'],
+            'side': order['side'],
+            'type': order['type'],
+            'size': order['size'],
+            'status': 'CLOSED',
+            'created_at': now_ms,
+        }
+
+    async def positions_list(self, request):
+        account_address = self._account_from_bearer(request)
+        positions = [position for position in self.positions.get(account_address, {}).values() if position['status'] == 'OPEN']
+        return web.json_response({'results': positions})
+
+    def create_app(self):
+        app = web.Application(middlewares=[self.fault_injection])
+        app.on_response_prepare.append(self.set_date_header)
+        app.router.add_get('/v1/system/time', self.system_time)
+        app.router.add_get('/v1/system/config', self.system_config)
+        app.router.add_get('/v1/markets', self.markets)
+        app.router.add_get('/v1/markets/summary', self.markets_summary)
+        app.router.add_post('/v1/auth', self.auth)
+        app.router.add_get('/v1/account', self.account)
+        app.router.add_post('/v1/orders', self.create_order)
+        if self.batch_orders:
+            app.router.add_post('/v1/orders/batch', self.create_orders_batch)
+        app.router.add_get('/v1/positions', self.positions_list)
+        return app
+
+
+async def start_mock_server(mock, host='127.0.0.1', port=0):
+    """Запускает сервер в текущем event loop. Возвращает (runner, base_url); остановка - await runner.cleanup()."""
+    runner = web.AppRunner(mock.create_app())
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = runner.addresses[0][1]
+    return runner, f"http://{host}:{bound_port}/v1"
+
+
+def public_keys_from_wallets(wallets):
+    return {wallet['address']: private_to_stark_key(int(wallet['private_key'], 16)) for wallet in wallets}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный заменитель Paradex API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--wallets", default="wallets.json", help="кошельки, чьи подписи принимаются")
+    parser.add_argument("--latency-ms", type=float, nargs=2, default=(0, 0), metavar=("MIN", "MAX"))
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--clock-skew", type=float, default=0.0, help="на сколько секунд часы сервера опережают системные")
+    parser.add_argument("--no-verify", action="store_true", help="не проверять подписи")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    public_keys = {}
+    if not args.no_verify:
+        with open(args.wallets, 'r') as f:
+            public_keys = public_keys_from_wallets(json.load(f))
+    mock = MockParadex(
+        public_keys=public_keys,
+        latency_ms=tuple(args.latency_ms),
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        verify_signatures=not args.no_verify,
+        seed=args.seed,
+        clock_skew_seconds=args.clock_skew,
+    )
+    web.run_app(mock.create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,45 @@
 #!/usr/bin/env python3
-import aiohttp
+import time
+_import_started = time.perf_counter()
+
+import argparse
 import asyncio
 import json
-import time
 import random
+import re
 import logging
+from decimal import Decimal
 
 # --- Настройка логирования ---
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from bot_logging import LazyJson, configure_order_buffer, get_account_logger, order_payloads, setup_logging
+setup_logging()
 
 # --- Импорт функций StarkNet подписи из файла (см. ниже) ---
-from starknet import generate_starknet_auth_signature, generate_starknet_order_signature
+from starknet import configure_signing_service, get_signing_service, get_typed_data_hasher, load_crypto, shutdown_signing_service
+from jwt_cache import JwtTokenCache
+from http_session import SessionManager
+from request_executor import DEFAULT_API_URL, ClientRequestError, OutcomeUnknownError, RequestError, RequestExecutor, build_policies
+from paradex_config_cache import PARADEX_CONFIG_CACHE_FILE, ParadexConfigCache
+from ws_tracker import WS_URL, PositionTracker
+from clock import SystemClock
+from server_clock import ServerClock
+from rate_limiter import DEFAULT_RATE_LIMITS, RateLimiter
+from market_cache import MarketCache
+from run_journal import RUN_JOURNAL_FILE, RunJournal
+from cassette import CassettePlayer, CassetteRecorder
+from profiling import CycleProfiler
+from metrics import Metrics, start_metrics_server, write_snapshot, write_snapshots_periodically
+IMPORT_SECONDS = time.perf_counter() - _import_started
 
 # --- Конфигурация и Данные ---
 CONFIG_FILE = "config.json"
 WALLET_FILE = "wallets.json"
 PROXY_FILE = "proxies.txt"
 USER_AGENT_FILE = "user_agents.txt"  # Файл с User-Agent
+HEX_NUMBER = re.compile(r'(0x)?[0-9a-fA-F]+')  # адрес или приватный ключ в wallets.json, с 0x или без
+BATCH_ORDERS_LIMIT = 10  # Максимум ордеров в одном запросе /orders/batch
+HTTP_CASSETTE_FILE = "requests.jsonl"
+PREFLIGHT_CHAIN_ID = "PRIVATE_SN_POTC_SEPOLIA"  # chain id тестовой сети Paradex для --check без кеша конфигурации
 
 # --- Загрузка данных из файлов ---
 def load_config():
@@ -75,156 +98,440 @@ def load_user_agents():
         logging.error(f"Ошибка: Файл User-Agent '{USER_AGENT_FILE}' не найден.")
         return []
 
-# --- Асинхронные функции для API Paradex (с повторными попытками) ---
-async def get_jwt_token(session, account_data, paradex_config):
-    api_url = "https://api.testnet.paradex.trade/v1/auth"
-    current_time = int(time.time())
-    expiration_time = current_time + 1800
+def validate_config(config):
+    """Проверяет типы и диапазоны параметров конфигурации. Возвращает список ошибок."""
+    errors = []
+    if not isinstance(config['trading_pair'], str) or not config['trading_pair']:
+        errors.append("'trading_pair' должен быть непустой строкой")
+    range_params = [
+        "balance_usage_percentage",
+        "delay_between_cycles_seconds",
+        "delay_between_trades_seconds",
+        "delay_between_buy_sell_seconds",
+        "delay_between_groups_seconds",
+        "cycles_per_account",
+    ]
+    for param in range_params:
+        value = config[param]
+        if (not isinstance(value, list) or len(value) != 2
+                or not all(isinstance(bound, (int, float)) and not isinstance(bound, bool) for bound in value)):
+            errors.append(f"'{param}' должен быть списком [min, max] из двух чисел, получено {value!r}")
+        elif value[0] > value[1] or value[0] < 0:
+            errors.append(f"'{param}': некорректный диапазон {value}")
+    if not errors and not all(isinstance(bound, int) for bound in config['cycles_per_account']):
+        errors.append("'cycles_per_account' должен содержать целые числа")
+    if not errors and config['balance_usage_percentage'][1] > 100:
+        errors.append("'balance_usage_percentage' не может превышать 100")
+    log_level = config.get('log_level', 'INFO')
+    if not (isinstance(log_level, int) and not isinstance(log_level, bool)
+            or isinstance(log_level, str) and isinstance(logging.getLevelName(log_level.upper()), int)):
+        errors.append(f"'log_level' должен быть уровнем логирования (DEBUG, INFO, WARNING, ...), получено {log_level!r}")
+    if config.get('signing_executor', 'thread') not in ('thread', 'process'):
+        errors.append(f"'signing_executor' должен быть \"thread\" или \"process\", получено {config['signing_executor']!r}")
+    signing_workers = config.get('signing_workers')
+    if signing_workers is not None and (not isinstance(signing_workers, int) or isinstance(signing_workers, bool) or signing_workers < 1):
+        errors.append(f"'signing_workers' должен быть положительным целым числом или null, получено {signing_workers!r}")
+    if config.get('http_cassette_mode') not in (None, 'record', 'replay'):
+        errors.append(f"'http_cassette_mode' должен быть \"record\", \"replay\" или null, получено {config['http_cassette_mode']!r}")
+    errors.extend(validate_rate_limits(config.get('rate_limits')))
+    return [f"Ошибка конфигурации: {error}" for error in errors]
+
+def validate_rate_limits(rate_limits):
+    """Проверяет 'rate_limits': {класс эндпоинтов: {"rate": ..., "burst": ...}}. Возвращает список ошибок."""
+    if rate_limits is None:
+        return []
+    if not isinstance(rate_limits, dict):
+        return [f"'rate_limits' должен быть объектом {{класс: {{\"rate\": ..., \"burst\": ...}}}}, получено {rate_limits!r}"]
+    errors = []
+    for endpoint_class, params in rate_limits.items():
+        if endpoint_class not in DEFAULT_RATE_LIMITS:
+            errors.append(f"'rate_limits': неизвестный класс эндпоинтов '{endpoint_class}' (допустимы: {', '.join(DEFAULT_RATE_LIMITS)})")
+            continue
+        if not isinstance(params, dict):
+            errors.append(f"'rate_limits.{endpoint_class}' должен быть объектом {{\"rate\": ..., \"burst\": ...}}, получено {params!r}")
+            continue
+        for param, value in params.items():
+            if param not in ('rate', 'burst'):
+                errors.append(f"'rate_limits.{endpoint_class}': неизвестный параметр '{param}'")
+            elif not isinstance(value, (int, float)) or isinstance(value, bool) or value <= 0:
+                errors.append(f"'rate_limits.{endpoint_class}.{param}' должен быть положительным числом, получено {value!r}")
+            elif param == 'burst' and value < 1:
+                # Ёмкость меньше 1 не даст ни одного токена: запросы этого класса ждали бы вечно
+                errors.append(f"'rate_limits.{endpoint_class}.burst' должен быть не меньше 1, получено {value!r}")
+    return errors
+
+def validate_wallets(wallets):
+    """Проверяет формат адресов и приватных ключей (hex). Возвращает список ошибок."""
+    errors = []
+    seen_addresses = set()
+    for index, wallet in enumerate(wallets):
+        if not isinstance(wallet, dict) or 'address' not in wallet or 'private_key' not in wallet:
+            errors.append(f"Кошелёк #{index}: нужны поля 'address' и 'private_key'")
+            continue
+        for field in ('address', 'private_key'):
+            value = wallet[field]
+            try:
+                if not isinstance(value, str) or not HEX_NUMBER.fullmatch(value) or int(value, 16) <= 0:
+                    raise ValueError
+            except ValueError:
+                errors.append(f"Кошелёк #{index}: '{field}' должен быть положительным hex числом (0x... или без префикса)")
+        if wallet['address'] in seen_addresses:
+            errors.append(f"Кошелёк #{index}: адрес {wallet['address']} повторяется")
+        seen_addresses.add(wallet['address'])
+    return errors
+
+# --- Асинхронные функции для API Paradex (повторные попытки - в RequestExecutor) ---
+async def get_jwt_token(executor, session, account_data, paradex_config):
+    """Получает JWT токен. Подпись и метки времени обновляются на каждой попытке."""
+    api_url = "/auth"
+    log = get_account_logger(account_data)
+
+    async def signed_headers():
+        current_time = int(executor.clock.time())
+        expiration_time = current_time + 1800
+        # Получаем подпись как список
+        signature_parts = await get_signing_service().sign_auth(
+            account_data['address'],
+            current_time,
+            expiration_time,
+            account_data['private_key'],
+            paradex_config
+        )
+        return {'headers': {
+            'Accept': 'application/json',
+            'PARADEX-STARKNET-ACCOUNT': account_data['address'],
+            'PARADEX-TIMESTAMP': str(current_time),
+            'PARADEX-SIGNATURE-EXPIRATION': str(expiration_time),
+            # Преобразуем список в корректную JSON-строку
+            'PARADEX-STARKNET-SIGNATURE': json.dumps(signature_parts),
+        }}
+
+    try:
+        jwt_response_json = await executor.request(session, 'auth', 'POST', api_url, prepare=signed_headers, proxy=account_data['proxy'], log=log)
+    except RequestError as e:
+        log.error("Ошибка API при запросе JWT токена: %s", e)
+        return None
+    jwt_token = jwt_response_json.get('jwt_token')
+    if jwt_token:
+        log.info("JWT токен успешно получен.")
+        return jwt_token
+    log.error("Ошибка получения JWT токена, токен не найден. Ответ API: %s", jwt_response_json)
+    return None
+
+async def get_account_info(executor, session, jwt_token, proxy):
+    """Получает информацию об аккаунте."""
+    api_url = "/account"
     headers = {
         'Accept': 'application/json',
-        'PARADEX-STARKNET-ACCOUNT': account_data['address'],
-        'PARADEX-TIMESTAMP': str(current_time),
-        'PARADEX-SIGNATURE-EXPIRATION': str(expiration_time)
+        'Authorization': f'Bearer {jwt_token}'
     }
-    # Получаем подпись как список
-    signature_parts = generate_starknet_auth_signature(
-        account_data['address'],
-        current_time,
-        expiration_time,
-        account_data['private_key'],
-        paradex_config
-    )
-    # Преобразуем список в корректную JSON-строку
-    headers['PARADEX-STARKNET-SIGNATURE'] = json.dumps(signature_parts)
-
-    retry_delay_seconds = 5
-    while True:
-        try:
-            async with session.post(api_url, headers=headers, proxy=account_data['proxy']) as response:
-                logging.info(f"Аккаунт {account_data['account_index']}: Запрос JWT, статус ответа: {response.status}")
-                response.raise_for_status()
-                raw_response_text = await response.text()
-                jwt_response_json = await response.json()
-                jwt_token = jwt_response_json.get('jwt_token')
-                if jwt_token:
-                    logging.info(f"Аккаунт {account_data['account_index']}: JWT токен успешно получен.")
-                    return jwt_token
-                else:
-                    logging.error(f"Аккаунт {account_data['account_index']}: Ошибка получения JWT токена, токен не найден. Ответ API: {jwt_response_json}")
-        except aiohttp.ClientError as e:
-            logging.error(f"Аккаунт {account_data['account_index']}: Ошибка API при запросе JWT токена: {e}. Повторная попытка через {retry_delay_seconds} секунд...")
-        except Exception as e:
-            logging.error(f"Аккаунт {account_data['account_index']}: Непредвиденная ошибка при обработке ответа JWT токена: {e}. Повторная попытка через {retry_delay_seconds} секунд...")
-        await asyncio.sleep(retry_delay_seconds)
-
-async def get_account_info(session, jwt_token, proxy):
-    """Получает информацию об аккаунте с повторными попытками."""
-    api_url = "https://api.testnet.paradex.trade/v1/account"
+    try:
+        return await executor.request(session, 'account', 'GET', api_url, headers=headers, proxy=proxy)
+    except RequestError as e:
+        logging.error(f"Ошибка получения информации об аккаунте: {e}")
+        return None
+
+def order_request_body(order_params):
+    """Тело ордера для API из подписанных параметров."""
+    #  Удаляем лишние параметры 'leverage' и 'account_address', а также 'price' для MARKET ордеров
+    order_params_to_send = {
+        key: order_params[key] for key in order_params if key not in ('leverage', 'account_address')
+    }
+    if order_params_to_send['type'] == 'MARKET': # <---- Добавляем условие для удаления price
+        if 'price' in order_params_to_send:
+            del order_params_to_send['price']
+    return order_params_to_send
+
+async def place_order(executor, session, jwt_token, order_params, private_key, proxy, paradex_config, account_data):
+    """
+    Размещает ордер. На каждой попытке ордер подписывается заново со свежей меткой времени,
+    отклонённый (4xx) ордер не повторяется. Если ордер отправлен, но ответ не получен,
+    пробрасывается OutcomeUnknownError: ордер мог исполниться.
+    """
+    api_url = "/orders"
     headers = {
+        'Content-Type': 'application/json',
         'Accept': 'application/json',
         'Authorization': f'Bearer {jwt_token}'
     }
-    retry_delay_seconds = 5
-    while True:
-        try:
-            async with session.get(api_url, headers=headers, proxy=proxy) as response:
-                response.raise_for_status()
-                return await response.json()
-        except aiohttp.ClientError as e:
-            logging.error(f"Ошибка получения информации об аккаунте: {e}. Повторная попытка через {retry_delay_seconds} секунд...")
-        except Exception as e:
-            logging.error(f"Непредвиденная ошибка при получении информации об аккаунте: {e}. Повторная попытка через {retry_delay_seconds} секунд...")
-        await asyncio.sleep(retry_delay_seconds)
-
-async def place_order(session, jwt_token, order_params, private_key, proxy, paradex_config, account_data):
-    """Размещает ордер с повторными попытками."""
-    api_url = "https://api.testnet.paradex.trade/v1/orders"
+    log = get_account_logger(account_data)
+
+    async def signed_order():
+        order_params['signature_timestamp'] = int(executor.clock.time() * 1000) # Исправление 2: Timestamp в миллисекундах
+        order_params['signature'] = await get_signing_service().sign_order(order_params, private_key, paradex_config, account_data['address'])
+        order_params_to_send = order_request_body(order_params)
+        order_payloads.append(account_data['account_index'], order_params_to_send)
+        log.debug("Параметры ордера перед отправкой (JSON): %s", LazyJson(order_params_to_send))
+        return {'json': order_params_to_send}
+
+    try:
+        order_response = await executor.request(session, 'orders', 'POST', api_url, prepare=signed_order, headers=headers, proxy=proxy, log=log)
+    except OutcomeUnknownError:
+        order_payloads.flush("результат размещения ордера неизвестен")
+        raise
+    except RequestError as e:
+        log.error("Ошибка размещения ордера: %s", e)
+        order_payloads.flush("ошибка размещения ордера")
+        return None
+    log.debug("Ответ API на размещение ордера: %s", LazyJson(order_response))
+    return order_response
+
+async def place_orders_batch(executor, session, jwt_token, orders_params, private_key, proxy, paradex_config, account_data):
+    """
+    Размещает до BATCH_ORDERS_LIMIT ордеров одним запросом. Все ордера пачки подписываются
+    одним вызовом sign_batch, на каждой попытке заново.
+    Возвращает список ответов в порядке orders_params (None - ордер отклонён) или None,
+    если запрос не выполнен. Если биржа не поддерживает пакетные ордера, это запоминается
+    в executor и дальше ордера отправляются по одному.
+    """
+    api_url = "/orders/batch"
     headers = {
         'Content-Type': 'application/json',
         'Accept': 'application/json',
         'Authorization': f'Bearer {jwt_token}'
     }
-    order_params['signature_timestamp'] = int(time.time() * 1000) # Исправление 2: Timestamp в миллисекундах
-    order_params['signature'] = generate_starknet_order_signature(order_params, private_key, paradex_config, account_data['address'])
+    log = get_account_logger(account_data)
+
+    async def signed_orders():
+        timestamp = int(executor.clock.time() * 1000)
+        for order_params in orders_params:
+            order_params['signature_timestamp'] = timestamp
+        signatures = await get_signing_service().sign_batch([
+            ("order", (dict(order_params), private_key, paradex_config, account_data['address']))
+            for order_params in orders_params
+        ])
+        bodies = []
+        for order_params, signature in zip(orders_params, signatures):
+            order_params['signature'] = signature
+            bodies.append(order_request_body(order_params))
+            order_payloads.append(account_data['account_index'], bodies[-1])
+        return {'json': bodies}
 
-    #  Удаляем лишние параметры 'leverage' и 'account_address', а также 'price' для MARKET ордеров
-    order_params_to_send = {
-        key: order_params[key] for key in order_params if key not in ('leverage', 'account_address')
-    }
-    if order_params_to_send['type'] == 'MARKET': # <---- Добавляем условие для удаления price
-        if 'price' in order_params_to_send:
-            del order_params_to_send['price']
+    try:
+        response = await executor.request(session, 'orders_batch', 'POST', api_url, prepare=signed_orders, headers=headers, proxy=proxy, log=log)
+    except ClientRequestError as e:
+        if e.status in (404, 405):
+            log.warning("Пакетные ордера не поддерживаются (%s), ордера будут отправляться по одному.", e)
+            executor.batch_orders_supported = False
+        else:
+            log.error("Ошибка размещения пачки ордеров: %s", e)
+            order_payloads.flush("ошибка размещения пачки ордеров")
+        return None
+    except OutcomeUnknownError:
+        # Ордера пачки могли исполниться: не повторяются ни пачкой, ни по одному
+        order_payloads.flush("результат пачки ордеров неизвестен")
+        return None
+    except RequestError as e:
+        log.error("Ошибка размещения пачки ордеров: %s", e)
+        order_payloads.flush("ошибка размещения пачки ордеров")
+        return None
+    log.debug("Ответ API на пачку ордеров: %s", LazyJson(response))
+
+    # Ошибки идут в порядке ордеров (null - ордер принят), принятые ордера - в том же порядке
+    accepted_orders = iter(response.get('orders') or [])
+    errors = response.get('errors') or [None] * len(orders_params)
+    results = []
+    for order_params, error in zip(orders_params, errors):
+        if error:
+            log.warning("Ордер %s %s из пачки отклонён: %s", order_params['side'], order_params['size'], error)
+            results.append(None)
+        else:
+            results.append(next(accepted_orders, None))
+    return results
 
-    logging.info(f"Аккаунт {account_data['account_index']}: Параметры ордера перед отправкой (JSON): {json.dumps(order_params_to_send)}")
-
-    retry_delay_seconds = 5
-    while True:
-        try:
-            async with session.post(api_url, headers=headers, json=order_params_to_send, proxy=proxy) as response:
-                raw_response_text = await response.text()
-                logging.info(f"Аккаунт {account_data['account_index']}: Ответ API на размещение ордера, статус: {response.status}, текст: {raw_response_text}")
-                response.raise_for_status()
-                return await response.json()
-        except aiohttp.ClientError as e:
-            logging.error(f"Аккаунт {account_data['account_index']}: Ошибка размещения ордера: {e}, Параметры: {order_params_to_send}. Повторная попытка через {retry_delay_seconds} секунд...")
-        except Exception as e:
-            logging.error(f"Аккаунт {account_data['account_index']}: Непредвиденная ошибка при размещении ордера: {e}. Параметры: {order_params_to_send}. Повторная попытка через {retry_delay_seconds} секунд...")
-        await asyncio.sleep(retry_delay_seconds)
-
-async def get_open_positions(session, jwt_token, proxy):
-    """Получает список открытых позиций с повторными попытками."""
-    api_url = "https://api.testnet.paradex.trade/v1/positions"
+async def get_open_positions(executor, session, jwt_token, proxy):
+    """Получает список открытых позиций."""
+    api_url = "/positions"
     headers = {
         'Accept': 'application/json',
         'Authorization': f'Bearer {jwt_token}'
     }
-    retry_delay_seconds = 5
-    while True:
-        try:
-            async with session.get(api_url, headers=headers, proxy=proxy) as response:
-                response.raise_for_status()
-                return await response.json()
-        except aiohttp.ClientError as e:
-            logging.error(f"Ошибка получения открытых позиций: {e}. Повторная попытка через {retry_delay_seconds} секунд...")
-        except Exception as e:
-            logging.error(f"Непредвиденная ошибка при получении открытых позиций: {e}. Повторная попытка через {retry_delay_seconds} секунд...")
-        await asyncio.sleep(retry_delay_seconds)
-
-async def close_positions(session, jwt_token, market, positions, private_key, proxy, paradex_config, config, account_data): # account_data added
-    """Закрывает открытые позиции на рынке с повторными попытками."""
-    closed_orders = []
+    try:
+        return await executor.request(session, 'positions', 'GET', api_url, headers=headers, proxy=proxy)
+    except RequestError as e:
+        logging.error(f"Ошибка получения открытых позиций: {e}")
+        return None
+
+async def close_positions(executor, session, token_cache, markets, positions, private_key, proxy, paradex_config, config, account_data): # account_data added
+    """
+    Закрывает открытые позиции аккаунта на рынках markets (по одной позиции на рынок).
+    Если ордеров на закрытие больше одного, они подписываются и отправляются пачками через
+    /orders/batch; один ордер, а также все ордера при выключенных (batch_close_orders) или
+    неподдерживаемых пакетных ордерах отправляются по отдельности, параллельно, не больше
+    close_order_concurrency сразу. Каждый запрос при 401 повторяется с новым токеном; ордер
+    или пачка с неизвестным результатом не повторяются, чтобы не закрыть позицию дважды.
+    Возвращает пары (рынок, ответ на ордер) закрытых позиций.
+    """
+    orders_params = []
     for position in positions.get('results', []):
-        if position['market'] == market:
+        if position['market'] in markets:
             side_to_close = "BUY" if position['side'] == "SHORT" else "SELL"
-            close_order_params = {
-                "market": market,
+            orders_params.append({
+                "market": position['market'],
                 "side": side_to_close,
                 "type": "MARKET",
                 "size": position['size'],
                 "instruction": "GTC",
                 "price": "0" # Price 0 for market close
-            }
-            order_response = await place_order(session, jwt_token, close_order_params, private_key, proxy, paradex_config, account_data) # account_data passed here
-            if order_response:
-                closed_orders.append(order_response)
-            else:
-                logging.warning(f"Не удалось разместить ордер на закрытие позиции: {position}")
+            })
+
+    results = [None] * len(orders_params)
+    pending = list(range(len(orders_params)))
+    if config.get('batch_close_orders', True) and len(orders_params) > 1:
+        while pending and executor.batch_orders_supported:
+            chunk, rest = pending[:BATCH_ORDERS_LIMIT], pending[BATCH_ORDERS_LIMIT:]
+            batch_results = await token_cache.call(
+                account_data,
+                lambda jwt_token: place_orders_batch(executor, session, jwt_token, [orders_params[i] for i in chunk], private_key, proxy, paradex_config, account_data),
+                session,
+            )
+            if batch_results is None and not executor.batch_orders_supported:
+                break  # пачка не отправлена: эти и остальные ордера уйдут по одному
+            for i, order_response in zip(chunk, batch_results or [None] * len(chunk)):
+                results[i] = order_response
+            pending = rest
+
+    if pending:
+        semaphore = asyncio.Semaphore(config.get('close_order_concurrency', 5))
+
+        async def close_one(i):
+            async with semaphore:
+                try:
+                    results[i] = await token_cache.call(
+                        account_data,
+                        lambda jwt_token: place_order(executor, session, jwt_token, orders_params[i], private_key, proxy, paradex_config, account_data),
+                        session,
+                    )
+                except OutcomeUnknownError:
+                    # Повтор мог бы закрыть позицию дважды; остаток закроется по следующему списку позиций
+                    results[i] = None
+
+        await asyncio.gather(*(close_one(i) for i in pending))
+
+    closed_orders = []
+    for order_params, order_response in zip(orders_params, results):
+        if order_response:
+            closed_orders.append((order_params['market'], order_response))
+        else:
+            logging.warning(f"Не удалось разместить ордер на закрытие позиции: {order_params['side']} {order_params['size']} {order_params['market']}")
     return closed_orders
 
 # --- Основная логика работы бота ---
-async def trade_cycle(account_data, config, paradex_config):
+class BotRuntime:
+    """Общие для всех аккаунтов компоненты, создаются один раз в run_bot(). paradex_config задаётся после загрузки."""
+
+    def __init__(self, config, clock=None):
+        self.clock = clock or SystemClock()
+        # Часы сервера: метки времени в подписях, сроки JWT и Retry-After считаются по ним
+        self.server_clock = ServerClock(self.clock, samples=config.get('clock_sync_samples', 3))
+        self.metrics = Metrics()
+        self.paradex_config = None
+        self.sessions = SessionManager(
+            connection_limit=config.get('http_connection_limit', 10),
+            keepalive_seconds=config.get('http_keepalive_seconds', 75),
+            dns_cache_seconds=config.get('http_dns_cache_seconds', 300),
+        )
+        # Кассета HTTP обмена: "record" - записывать ответы, "replay" - отвечать из файла без сети
+        cassette_mode = config.get('http_cassette_mode')
+        cassette_file = config.get('http_cassette_file', HTTP_CASSETTE_FILE)
+        self.cassette_recorder = CassetteRecorder(cassette_file, self.server_clock) if cassette_mode == 'record' else None
+        self.cassette_player = None
+        if cassette_mode == 'replay':
+            self.cassette_player = CassettePlayer(cassette_file, self.server_clock, config.get('http_cassette_replay_speed', 1.0))
+        self.executor = RequestExecutor(
+            build_policies(config.get('retry_policies')),
+            breaker_threshold=config.get('circuit_breaker_threshold', 5),
+            breaker_reset_seconds=config.get('circuit_breaker_reset_seconds', 30),
+            base_url=config.get('api_url', DEFAULT_API_URL),
+            clock=self.server_clock,
+            metrics=self.metrics,
+            rate_limiter=RateLimiter(config.get('rate_limits'), self.clock),
+            cassette_recorder=self.cassette_recorder,
+            cassette_player=self.cassette_player,
+            clock_sync=self.server_clock,
+        )
+        self.config_cache = ParadexConfigCache(
+            config.get('paradex_config_cache_file', PARADEX_CONFIG_CACHE_FILE),
+            ttl_seconds=config.get('paradex_config_ttl_seconds', 3600),
+            max_stale_seconds=config.get('paradex_config_max_stale_seconds', 7 * 24 * 3600),
+            api_url=self.executor.base_url,
+        )
+        self.token_cache = JwtTokenCache(
+            lambda account_data, session: get_jwt_token(self.executor, session or self.sessions.for_account(account_data), account_data, self.paradex_config),
+            refresh_margin_seconds=config.get('jwt_refresh_margin_seconds', 120),
+            clock=self.server_clock,
+        )
+        self.markets = MarketCache(
+            lambda: get_markets(self.executor, self.sessions.public()),
+            lambda: get_markets_summary(self.executor, self.sessions.public()),
+            ttl_seconds=config.get('markets_ttl_seconds', 3600),
+            price_ttl_seconds=config.get('mark_price_ttl_seconds', 30),
+            clock=self.clock,
+        )
+        self.profiler = CycleProfiler(config.get('profile_dir'))
+        self.journal = RunJournal(config.get('journal_file', RUN_JOURNAL_FILE), self.clock)
+        # WS трекер позиций опционален; без него позиции берутся через REST
+        self.positions = None
+        if config.get('use_websocket', False):
+            self.positions = PositionTracker(self.sessions, self.token_cache, config.get('ws_url', WS_URL), clock=self.clock)
+
+    async def close(self):
+        if self.positions is not None:
+            await self.positions.close()
+        await self.config_cache.close()
+        await self.token_cache.close()
+        await self.sessions.close()
+        self.journal.close()
+        if self.cassette_recorder is not None:
+            self.cassette_recorder.close()
+        if self.cassette_player is not None:
+            logging.info(
+                f"Воспроизведено из кассеты: {self.cassette_player.replayed} (повторно: {self.cassette_player.reused}), "
+                f"не использовано: {self.cassette_player.remaining()}"
+            )
+
+async def fetch_open_positions(runtime, session, account_data):
+    """Позиции из WS трекера, а если он выключен или неактуален - через REST (и засев трекера)."""
+    if runtime.positions is not None:
+        tracked_positions = runtime.positions.positions(account_data)
+        if tracked_positions is not None:
+            logging.info(f"Аккаунт {account_data['account_index']}: позиции взяты из WS трекера.")
+            return tracked_positions
+    open_positions = await runtime.token_cache.call(
+        account_data,
+        lambda jwt_token: get_open_positions(runtime.executor, session, jwt_token, account_data['proxy']),
+        session,
+    )
+    if runtime.positions is not None:
+        runtime.positions.seed(account_data, open_positions)
+    return open_positions
+
+async def close_account_positions(runtime, session, account_data, markets, open_positions, paradex_config, config):
+    """Закрывает позиции аккаунта на рынках markets одной пачкой и отмечает в журнале рынки, закрытые полностью."""
+    closed_orders = await close_positions(runtime.executor, session, runtime.token_cache, markets, open_positions, account_data['private_key'], account_data['proxy'], paradex_config, config, account_data)
+    closed_markets = [market for market, _ in closed_orders]
+    for market in markets:
+        to_close = sum(1 for position in open_positions.get('results', []) if position['market'] == market)
+        if closed_markets.count(market) == to_close:
+            await runtime.journal.record('positions_closed', account_index=account_data['account_index'], market=market)
+    return [order_response for _, order_response in closed_orders]
+
+async def trade_cycle(account_data, config, paradex_config, runtime):
     """Торговый цикл для одного аккаунта."""
     logging.info(f"Начинаем торговый цикл для аккаунта: {account_data['address']}")
-    default_headers = {
-        'User-Agent': account_data['user_agent'] if account_data['user_agent'] else 'ParadexBot-Default-UA'
-    }
-    session = aiohttp.ClientSession(headers=default_headers)
+    session = runtime.sessions.for_account(account_data)
+    token_cache = runtime.token_cache
+    executor = runtime.executor
     try:
-        jwt_token = await get_jwt_token(session, account_data, paradex_config)
+        with runtime.profiler.phase("auth"):
+            jwt_token = await token_cache.get(account_data, session)
         if not jwt_token:
             logging.warning(f"Пропускаем аккаунт {account_data['address']} из-за ошибки аутентификации.")
             return
-        account_info = await get_account_info(session, jwt_token, account_data['proxy'])
+        if runtime.positions is not None:
+            runtime.positions.start(account_data)
+        with runtime.profiler.phase("account"):
+            account_info = await token_cache.call(account_data, lambda jwt_token: get_account_info(executor, session, jwt_token, account_data['proxy']), session)
         if not account_info:
             logging.warning(f"Пропускаем аккаунт {account_data['address']} из-за ошибки получения информации об аккаунте.")
             return
@@ -244,9 +551,19 @@ async def trade_cycle(account_data, config, paradex_config):
 
         # --- Размещение ордеров (Лонг/Шорт) ---
         order_side = account_data['order_side']
-        order_size = str(int(position_size_usd))
+        order_notional = Decimal(str(position_size_usd))
         if order_side == "SHORT_HALF":
-            order_size = str(int(position_size_usd / 2.0))
+            order_notional /= 2
+        quantizer = await runtime.markets.quantizer(config['trading_pair'])
+        mark_price = await runtime.markets.mark_price(config['trading_pair'])
+        if quantizer is None or mark_price is None:
+            logging.warning(f"Аккаунт {account_data['address']}: нет метаданных или mark price рынка {config['trading_pair']}. Пропускаем.")
+            return
+        order_size = quantizer.size_for_notional(order_notional, mark_price)
+        if order_size is None:
+            logging.warning(f"Аккаунт {account_data['address']}: ордер на {order_notional:.2f} USD меньше минимального для {config['trading_pair']}. Пропускаем.")
+            return
+        logging.info(f"Аккаунт {account_data['address']}: размер ордера {order_size} (mark price {mark_price})")
 
         order_params = {
             "market": config['trading_pair'],
@@ -256,11 +573,31 @@ async def trade_cycle(account_data, config, paradex_config):
             "instruction": "GTC",
         }
 
-        logging.info(f"Аккаунт {account_data['account_index']}: Используемый приватный ключ (последние 5 символов): {account_data['private_key'][-5:]}") # <---- Лог приватного ключа
-
-        order_response = await place_order(session, jwt_token, order_params, account_data['private_key'], account_data['proxy'], paradex_config, account_data)
-        if order_response:
-            logging.info(f"Аккаунт {account_data['address']} разместил {order_side} ордер. Ответ: {order_response}")
+        order_unknown = False
+        with runtime.profiler.phase("order"):
+            try:
+                order_response = await token_cache.call(
+                    account_data,
+                    lambda jwt_token: place_order(executor, session, jwt_token, order_params, account_data['private_key'], account_data['proxy'], paradex_config, account_data),
+                    session,
+                )
+            except OutcomeUnknownError:
+                order_response = None
+                order_unknown = True
+        if order_unknown:
+            # Ордер мог исполниться: позиция закрывается по списку позиций, как обычно, а журнал помнит о ней
+            logging.warning(f"Аккаунт {account_data['address']}: результат {order_side} ордера неизвестен, позиция будет проверена при закрытии.")
+            await runtime.journal.record(
+                'order_placed', account_index=account_data['account_index'], market=order_params['market'],
+                side=order_params['side'], size=order_size, order_id=None,
+            )
+        elif order_response:
+            logging.info("Аккаунт %s разместил %s ордер: id %s, статус %s.", account_data['address'], order_side, order_response.get('id'), order_response.get('status'))
+            logging.debug("Аккаунт %s: ответ на %s ордер: %s", account_data['address'], order_side, LazyJson(order_response))
+            await runtime.journal.record(
+                'order_placed', account_index=account_data['account_index'], market=order_params['market'],
+                side=order_params['side'], size=order_size, order_id=order_response.get('id'),
+            )
         else:
             logging.warning(f"Аккаунт {account_data['address']} НЕ смог разместить {order_side} ордер. Ошибка.")
 
@@ -269,54 +606,105 @@ async def trade_cycle(account_data, config, paradex_config):
             delay_buy_sell_seconds_min, delay_buy_sell_seconds_max = config['delay_between_buy_sell_seconds']
             delay_buy_sell_seconds = random.uniform(delay_buy_sell_seconds_min, delay_buy_sell_seconds_max)
             logging.info(f"Аккаунт {account_data['address']}: Ждем {delay_buy_sell_seconds:.2f} секунд после {order_side} ордера...")
-            await asyncio.sleep(delay_buy_sell_seconds)
+            await runtime.clock.sleep(delay_buy_sell_seconds)
 
         delay_seconds_min, delay_seconds_max = config['delay_between_trades_seconds']
         delay_seconds = random.uniform(delay_seconds_min, delay_seconds_max)
         logging.info(f"Аккаунт {account_data['address']}: Ждем {delay_seconds:.2f} секунд перед закрытием позиций...")
-        await asyncio.sleep(delay_seconds)
+        await runtime.clock.sleep(delay_seconds)
+
+        if order_response and runtime.positions is not None:
+            order_status = runtime.positions.order_status(account_data, order_response.get('id'))
+            logging.info(f"Аккаунт {account_data['address']}: статус {order_side} ордера по WS: {order_status or 'нет данных'}")
 
-        open_positions = await get_open_positions(session, jwt_token, account_data['proxy'])
+        with runtime.profiler.phase("positions"):
+            open_positions = await fetch_open_positions(runtime, session, account_data)
         if open_positions:
-            closed_orders = await close_positions(session, jwt_token, config['trading_pair'], open_positions, account_data['private_key'], account_data['proxy'], paradex_config, config, account_data) # account_data added
-            logging.info(f"Аккаунт {account_data['address']}: Закрыто {len(closed_orders)} позиций. Ответы: {closed_orders}")
+            with runtime.profiler.phase("close"):
+                closed_orders = await close_account_positions(runtime, session, account_data, [config['trading_pair']], open_positions, paradex_config, config)
+            logging.info("Аккаунт %s: Закрыто %d позиций, id ордеров: %s", account_data['address'], len(closed_orders), [order.get('id') for order in closed_orders])
+            logging.debug("Аккаунт %s: ответы на закрытие позиций: %s", account_data['address'], LazyJson(closed_orders))
         else:
             logging.warning(f"Аккаунт {account_data['address']}: Не удалось получить список открытых позиций для закрытия.")
 
         cycle_delay_seconds_min, cycle_delay_seconds_max = config['delay_between_cycles_seconds']
         cycle_delay_seconds = random.uniform(cycle_delay_seconds_min, cycle_delay_seconds_max)
         logging.info(f"Аккаунт {account_data['address']}: Ждем {cycle_delay_seconds:.2f} секунд перед следующим циклом...")
-        await asyncio.sleep(cycle_delay_seconds)
+        await runtime.clock.sleep(cycle_delay_seconds)
 
     except Exception as e:
         logging.error(f"!!! Общая ошибка в торговом цикле для аккаунта {account_data['address']}: {e}")
     finally:
-        await session.close()
         logging.info(f"Торговый цикл для аккаунта {account_data['address']} завершен.\n")
 
-async def get_paradex_config(paradex_http_url):
+async def profiled_trade_cycle(account_data, config, paradex_config, runtime, cycle_number):
+    """trade_cycle, помеченный для профилировщика аккаунтом и номером цикла."""
+    with runtime.profiler.cycle(account_data['account_index'], cycle_number):
+        await trade_cycle(account_data, config, paradex_config, runtime)
+
+async def get_paradex_config(executor, session):
     """Загружает конфигурацию Paradex API."""
-    url = paradex_http_url + '/system/config'
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            logging.info(f"Запрос config, статус ответа: {response.status}")
-            try:
-                response.raise_for_status()
-            except aiohttp.ClientResponseError as e:
-                logging.error(f"Ошибка при загрузке paradex_config: HTTP статус {response.status}, текст ошибки: {e}")
-                return None
-            except Exception as e:
-                logging.error(f"Непредвиденная ошибка при загрузке paradex_config: {e}")
-                return None
-            paradex_config = await response.json()
-            logging.info(f"Paradex Config:\n{json.dumps(paradex_config, indent=2)}") # <---- Лог paradex_config
-            return paradex_config
+    url = '/system/config'
+    try:
+        paradex_config = await executor.request(session, 'config', 'GET', url)
+    except RequestError as e:
+        logging.error(f"Ошибка при загрузке paradex_config: {e}")
+        return None
+    logging.debug("Paradex Config:\n%s", LazyJson(paradex_config, indent=2))
+    return paradex_config
+
+async def get_server_time(executor, session):
+    """Время сервера Paradex (unix-время в секундах) или None."""
+    try:
+        response = await executor.request(session, 'time', 'GET', '/system/time')
+    except RequestError as e:
+        logging.warning(f"Ошибка при запросе времени сервера: {e}")
+        return None
+    server_time = (response or {}).get('server_time')
+    return int(server_time) / 1000 if server_time is not None else None
+
+async def get_markets(executor, session):
+    """Загружает метаданные рынков (шаги размера и цены, минимальный notional)."""
+    try:
+        return await executor.request(session, 'markets', 'GET', '/markets')
+    except RequestError as e:
+        logging.error(f"Ошибка при загрузке метаданных рынков: {e}")
+        return None
+
+async def get_markets_summary(executor, session):
+    """Загружает сводку по всем рынкам (mark price)."""
+    try:
+        return await executor.request(session, 'markets', 'GET', '/markets/summary', params={'market': 'ALL'})
+    except RequestError as e:
+        logging.error(f"Ошибка при загрузке сводки рынков: {e}")
+        return None
 
 # --- Основная функция бота ---
+def parse_args():
+    parser = argparse.ArgumentParser(description="Торговый бот Paradex")
+    parser.add_argument("--resume", action="store_true", help="продолжить прерванный прогон по журналу (journal_file)")
+    parser.add_argument("--check", action="store_true", help="проверить конфигурацию, кошельки и подпись без обращения к сети")
+    parser.add_argument("--profile", metavar="DIR", help="профилировать торговые циклы и записать результаты в DIR")
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument("--record", metavar="FILE", help="записать HTTP обмен в кассету (JSONL, секреты скрыты)")
+    cassette.add_argument("--replay", metavar="FILE", help="отвечать на HTTP запросы из кассеты вместо сети")
+    return parser.parse_args()
+
 async def main():
+    args = parse_args()
+    checks_started = time.perf_counter()
     config = load_config()
     if not config:
         return
+    if args.profile:
+        config.update(profile_dir=args.profile)
+    if args.record or args.replay:
+        config.update(http_cassette_mode='record' if args.record else 'replay', http_cassette_file=args.record or args.replay)
+    # Конфигурация проверяется до настройки логов: с некорректным log_level они настраиваются на INFO,
+    # чтобы вывести ошибки
+    config_errors = validate_config(config)
+    setup_logging('INFO' if config_errors else config.get('log_level', 'INFO'))
+    configure_order_buffer(config.get('order_log_buffer_size', 0))
 
     wallets = load_wallets()
     if not wallets:
@@ -340,11 +728,176 @@ async def main():
         logging.error(f"Ошибка: Количество кошельков ({len(wallets)}) не соответствует количеству прокси ({len(proxies)}). Бот остановлен.")
         return
 
-    paradex_config = await get_paradex_config("https://api.testnet.paradex.trade/v1")
-    if not paradex_config:
-        logging.error("Не удалось загрузить конфигурацию Paradex.")
+    errors = config_errors + validate_wallets(wallets)
+    for error in errors:
+        logging.error(error)
+    if errors:
+        logging.error("Бот остановлен.")
+        return
+    logging.info(f"Запуск: импорт модулей {IMPORT_SECONDS * 1000:.0f} мс, проверка файлов {(time.perf_counter() - checks_started) * 1000:.0f} мс.")
+
+    if args.check:
+        if not await preflight(config, wallets):
+            raise SystemExit(1)
         return
 
+    await run_bot(config, wallets, proxies, user_agents, resume=args.resume)
+
+
+async def preflight(config, wallets):
+    """
+    Проверка перед запуском (--check): загружает криптографию, проверяет диапазон ключей,
+    готовит хешеры и подписывает тестовое сообщение каждым ключом через пул подписи.
+    В сеть не обращается: chain id берётся из кеша конфигурации Paradex, если он есть.
+    """
+    crypto_seconds = load_crypto()
+    from starknet_py.constants import EC_ORDER
+
+    cached = ParadexConfigCache(
+        config.get('paradex_config_cache_file', PARADEX_CONFIG_CACHE_FILE), api_url=config.get('api_url', DEFAULT_API_URL).rstrip('/'),
+    ).load()
+    if cached is not None:
+        paradex_config = cached[0]
+    else:
+        paradex_config = {'starknet_chain_id': PREFLIGHT_CHAIN_ID}
+        logging.info(f"Кеш конфигурации Paradex не найден, для проверки подписи используется chain id {PREFLIGHT_CHAIN_ID}.")
+
+    ok = True
+    for index, wallet in enumerate(wallets):
+        if not 0 < int(wallet['private_key'], 16) < EC_ORDER:
+            logging.error(f"Кошелёк #{index}: приватный ключ вне допустимого диапазона StarkNet.")
+            ok = False
+    if not ok:
+        return False
+
+    signing_started = time.perf_counter()
+    configure_signing_service(config.get('signing_executor', 'thread'), config.get('signing_workers'))
+    try:
+        for wallet in wallets:
+            get_typed_data_hasher("Request", paradex_config['starknet_chain_id'], wallet['address'])
+            get_typed_data_hasher("Order", paradex_config['starknet_chain_id'], wallet['address'])
+        timestamp = int(time.time())
+        await get_signing_service().sign_batch([
+            ("auth", (wallet['address'], timestamp, timestamp + 1800, wallet['private_key'], paradex_config))
+            for wallet in wallets
+        ])
+    except Exception as e:
+        logging.error(f"Проверка подписи не пройдена: {e!r}")
+        return False
+    finally:
+        shutdown_signing_service()
+    logging.info(
+        f"Проверка пройдена: {len(wallets)} кошельков, загрузка криптографии {crypto_seconds * 1000:.0f} мс, "
+        f"прогрев подписи {(time.perf_counter() - signing_started) * 1000:.0f} мс."
+    )
+    return True
+
+
+async def run_bot(config, wallets, proxies, user_agents, clock=None, resume=False):
+    """
+    Запускает бота на уже проверенных данных. clock - часы (по умолчанию системные, в симуляции - виртуальные).
+    resume=True - продолжить прогон, записанный в журнале, вместо нового.
+    """
+    runtime = BotRuntime(config, clock)
+    metrics_server = None
+    snapshot_task = None
+    clock_syncing = None
+    clock_sync_task = None
+    snapshot_file = config.get('metrics_snapshot_file')
+    try:
+        if config.get('metrics_port'):
+            metrics_server = await start_metrics_server(runtime.metrics, port=config['metrics_port'])
+        if snapshot_file:
+            snapshot_task = asyncio.create_task(write_snapshots_periodically(
+                runtime.metrics, snapshot_file, config.get('metrics_snapshot_interval_seconds', 60), runtime.clock,
+            ))
+
+        # Расхождение часов с сервером оценивается параллельно с загрузкой конфигурации, до первой
+        # подписи, и затем периодически (кроме воспроизведения кассеты: записанное в ней время
+        # сервера устарело)
+        fetch_server_time = lambda: get_server_time(runtime.executor, runtime.sessions.public())
+        if runtime.cassette_player is None:
+            clock_syncing = asyncio.create_task(runtime.server_clock.sync(fetch_server_time))
+
+        # Криптография загружается в фоне, пока запрашивается конфигурация
+        crypto_loading = asyncio.ensure_future(asyncio.to_thread(load_crypto))
+        # Свежий конфиг из фоновой перепроверки подменяет словарь целиком: следующие группы
+        # берут runtime.paradex_config, уже запущенные подписи дочитывают прежний
+        runtime.paradex_config = await runtime.config_cache.get(
+            lambda: get_paradex_config(runtime.executor, runtime.sessions.public()),
+            on_update=lambda fresh_config: setattr(runtime, 'paradex_config', fresh_config),
+        )
+        logging.info(f"Криптография загружена за {await crypto_loading * 1000:.0f} мс (параллельно с загрузкой конфигурации).")
+        if not runtime.paradex_config:
+            logging.error("Не удалось загрузить конфигурацию Paradex.")
+            return
+
+        if clock_syncing is not None:
+            await clock_syncing
+            clock_sync_interval = config.get('clock_sync_interval_seconds', 300)
+            if clock_sync_interval:
+                clock_sync_task = asyncio.create_task(runtime.server_clock.run(fetch_server_time, clock_sync_interval))
+
+        # Пул для подписи: "thread" или "process", размер - signing_workers (по умолчанию число CPU)
+        configure_signing_service(config.get('signing_executor', 'thread'), config.get('signing_workers'), runtime.metrics)
+
+        state = runtime.journal.load() if resume else None
+        if resume and state is None:
+            logging.warning(f"Журнал '{runtime.journal.path}' не найден или пуст, начинаем новый прогон.")
+        elif state is not None and state.addresses != [wallet['address'] for wallet in wallets]:
+            logging.warning("Кошельки не совпадают с записанными в журнале, начинаем новый прогон.")
+            state = None
+        elif state is not None and state.finished:
+            logging.info("Прогон в журнале уже завершён, начинаем новый.")
+            state = None
+        runtime.journal.open(resume=state is not None)
+        runtime.profiler.start()
+        await run_cycles(config, runtime, wallets, proxies, user_agents, state)
+    finally:
+        runtime.profiler.stop()
+        for task in (clock_syncing, clock_sync_task):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        if snapshot_task is not None:
+            snapshot_task.cancel()
+            await asyncio.gather(snapshot_task, return_exceptions=True)
+            write_snapshot(runtime.metrics, snapshot_file)
+        if metrics_server is not None:
+            await metrics_server.cleanup()
+        runtime.metrics.log_summary()
+        await runtime.close()
+        shutdown_signing_service()
+
+
+async def close_leftover_positions(config, paradex_config, runtime, accounts_by_index, open_accounts):
+    """После падения: закрывает позиции аккаунтов, у которых по журналу остались открытые ордера."""
+    async def close_account(account_data, markets):
+        session = runtime.sessions.for_account(account_data)
+        open_positions = await runtime.token_cache.call(
+            account_data,
+            lambda jwt_token: get_open_positions(runtime.executor, session, jwt_token, account_data['proxy']),
+            session,
+        )
+        if open_positions is None:
+            logging.warning(f"Аккаунт {account_data['address']}: не удалось получить позиции для закрытия после восстановления.")
+            return
+        # Все рынки аккаунта закрываются одной пачкой
+        closed_orders = await close_account_positions(runtime, session, account_data, markets, open_positions, paradex_config, config)
+        logging.info(f"Аккаунт {account_data['address']}: после восстановления закрыто {len(closed_orders)} позиций на {', '.join(markets)}.")
+
+    logging.info(f"Восстановление: проверяем позиции {len(open_accounts)} аккаунтов.")
+    await asyncio.gather(*(
+        close_account(accounts_by_index[account_index], sorted(markets))
+        for account_index, markets in open_accounts.items()
+        if account_index in accounts_by_index
+    ))
+
+async def run_cycles(config, runtime, wallets, proxies, user_agents, state=None):
+    """
+    Распределяет аккаунты по группам и прогоняет торговые циклы. state - RunState из журнала при --resume.
+    Конфиг Paradex берётся из runtime.paradex_config перед каждой группой.
+    """
     # Связывание кошельков, прокси и User-Agent (1 к 1)
     account_data_list = []
     num_user_agents = len(user_agents)
@@ -362,60 +915,99 @@ async def main():
         }
         account_data_list.append(account_data)
 
-    cycles_per_account_min, cycles_per_account_max = config['cycles_per_account']
-    cycles_per_account = random.randint(cycles_per_account_min, cycles_per_account_max)
+    accounts_by_index = {account_data['account_index']: account_data for account_data in account_data_list}
+
+    if state is not None:
+        cycles_per_account = state.cycles_per_account
+        start_cycle = state.cycle
+        logging.info(f"Продолжаем прогон из журнала: цикл #{start_cycle + 1} из {cycles_per_account}, отработано групп: {len(state.groups_done)}.")
+        if state.open_accounts:
+            await close_leftover_positions(config, runtime.paradex_config, runtime, accounts_by_index, state.open_accounts)
+    else:
+        cycles_per_account_min, cycles_per_account_max = config['cycles_per_account']
+        cycles_per_account = random.randint(cycles_per_account_min, cycles_per_account_max)
+        start_cycle = 0
+        await runtime.journal.record('run_started', addresses=[wallet['address'] for wallet in wallets], cycles_per_account=cycles_per_account)
     logging.info(f"Бот будет работать {cycles_per_account} циклов на аккаунт.")
 
     delay_between_groups_seconds_min, delay_between_groups_seconds_max = config['delay_between_groups_seconds']
-    for cycle_number in range(cycles_per_account):
+    for cycle_number in range(start_cycle, cycles_per_account):
         logging.info(f"\n--- Начало цикла #{cycle_number + 1} ---")
-        random.shuffle(account_data_list)
-        account_groups = []
-        account_index = 0
-        num_accounts = len(account_data_list)
-        num_triplets = num_accounts // 3
-        remainder = num_accounts % 3
-        num_pairs = 0
-        if remainder == 1:
-            num_triplets -= 1
-            num_pairs += 2
-        elif remainder == 2:
-            num_pairs += 1
-        logging.info(f"Формируем {num_triplets} групп по 3 аккаунта и {num_pairs} групп по 2 аккаунта.")
-        for _ in range(num_triplets):
-            group = account_data_list[account_index:account_index + 3]
-            account_groups.append(group)
-            account_index += 3
-            logging.info(f"  Группа размера: {len(group)}")
-        for _ in range(num_pairs):
-            group = account_data_list[account_index:account_index + 2]
-            account_groups.append(group)
-            account_index += 2
-            logging.info(f"  Группа размера: {len(group)}")
+        groups_done = set()
+        if state is not None and cycle_number == state.cycle and state.groups is not None:
+            # Группы прерванного цикла восстанавливаются из журнала, отработанные пропускаются
+            account_groups = []
+            for recorded_group in state.groups:
+                group = [accounts_by_index[account_index] for account_index, _ in recorded_group]
+                for account_data, (_, order_side) in zip(group, recorded_group):
+                    account_data['order_side'] = order_side
+                account_groups.append(group)
+            groups_done = state.groups_done
+        else:
+            account_groups = form_groups(account_data_list)
+            await runtime.journal.record('groups', cycle=cycle_number, groups=[
+                [(account_data['account_index'], account_data['order_side']) for account_data in group]
+                for group in account_groups
+            ])
         logging.info(f"Сформировано групп: {len(account_groups)}")
         for group_index, group in enumerate(account_groups):
-            logging.info(f"\n-- Обработка группы #{group_index + 1} (размер: {len(group)}) --")
-            if len(group) == 2:
-                group[0]['order_side'] = "BUY"
-                group[1]['order_side'] = "SELL"
-            elif len(group) == 3:
-                group[0]['order_side'] = "BUY"
-                group[1]['order_side'] = "SELL"
-                group[2]['order_side'] = "SHORT_HALF"
-            else:
-                logging.error("Ошибка: Некорректный размер группы!")
+            if group_index in groups_done:
+                logging.info(f"-- Группа #{group_index + 1} уже отработана до перезапуска, пропускаем. --")
                 continue
+            logging.info(f"\n-- Обработка группы #{group_index + 1} (размер: {len(group)}) --")
             tasks = []
             for account_data in group:
                 if account_data['order_side'] is not None:
-                    tasks.append(trade_cycle(account_data, config, paradex_config))
+                    tasks.append(profiled_trade_cycle(account_data, config, runtime.paradex_config, runtime, cycle_number))
             await asyncio.gather(*tasks)
+            await runtime.journal.record('group_done', cycle=cycle_number, group=group_index)
             logging.info(f"-- Группа #{group_index + 1} отработана. Завершение обработки группы. --")
             delay_between_groups_seconds = random.uniform(delay_between_groups_seconds_min, delay_between_groups_seconds_max)
             logging.info(f"Ждем {delay_between_groups_seconds:.2f} секунд перед началом обработки следующей группы...")
-            await asyncio.sleep(delay_between_groups_seconds)
+            await runtime.clock.sleep(delay_between_groups_seconds)
+        await runtime.journal.record('cycle_done', cycle=cycle_number)
         logging.info(f"\n--- Цикл #{cycle_number + 1} завершен для всех групп. ---\n")
+    await runtime.journal.record('run_finished')
     logging.info("Все торговые циклы завершены.")
 
+def form_groups(account_data_list):
+    """Перемешивает аккаунты, делит их на группы по 3 и 2 и назначает стороны ордеров."""
+    random.shuffle(account_data_list)
+    account_groups = []
+    account_index = 0
+    num_accounts = len(account_data_list)
+    num_triplets = num_accounts // 3
+    remainder = num_accounts % 3
+    num_pairs = 0
+    if remainder == 1:
+        num_triplets -= 1
+        num_pairs += 2
+    elif remainder == 2:
+        num_pairs += 1
+    logging.info(f"Формируем {num_triplets} групп по 3 аккаунта и {num_pairs} групп по 2 аккаунта.")
+    for _ in range(num_triplets):
+        group = account_data_list[account_index:account_index + 3]
+        account_groups.append(group)
+        account_index += 3
+        logging.info(f"  Группа размера: {len(group)}")
+    for _ in range(num_pairs):
+        group = account_data_list[account_index:account_index + 2]
+        account_groups.append(group)
+        account_index += 2
+        logging.info(f"  Группа размера: {len(group)}")
+    for group in account_groups:
+        if len(group) == 2:
+            group[0]['order_side'] = "BUY"
+            group[1]['order_side'] = "SELL"
+        elif len(group) == 3:
+            group[0]['order_side'] = "BUY"
+            group[1]['order_side'] = "SELL"
+            group[2]['order_side'] = "SHORT_HALF"
+        else:
+            logging.error("Ошибка: Некорректный размер группы!")
+            for account_data in group:
+                account_data['order_side'] = None
+    return account_groups
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,92 @@
+"""
+Локальный кеш /v1/system/config.
+
+Если копия на диске моложе ttl_seconds, бот стартует сразу с неё, а конфиг
+перепроверяется в фоне. Если копия старше, конфиг запрашивается заново; когда
+эндпоинт недоступен, используется копия не старше max_stale_seconds.
+Копия привязана к api_url, с которого она загружена: после переключения между testnet,
+mainnet и mock сервером она не используется (другой starknet_chain_id).
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+
+PARADEX_CONFIG_CACHE_FILE = "paradex_config_cache.json"
+
+
+class ParadexConfigCache:
+    def __init__(self, path=PARADEX_CONFIG_CACHE_FILE, ttl_seconds=3600, max_stale_seconds=7 * 24 * 3600, api_url=None):
+        self.path = path
+        self.api_url = api_url
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self._revalidate_task = None
+
+    def load(self):
+        """Возвращает (paradex_config, возраст в секундах) или None, если кеша нет, он повреждён или загружен с другого api_url."""
+        try:
+            with open(self.path, 'r') as f:
+                cached = json.load(f)
+            if cached.get('api_url') != self.api_url:
+                logging.info(f"Кеш конфигурации Paradex '{self.path}' загружен с другого API ({cached.get('api_url')}), не используется.")
+                return None
+            return cached['paradex_config'], time.time() - cached['fetched_at']
+        except FileNotFoundError:
+            return None
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            logging.warning(f"Кеш конфигурации Paradex '{self.path}' повреждён и будет перезаписан: {e}")
+            return None
+
+    def save(self, paradex_config):
+        # Запись через временный файл, чтобы прерванный процесс не оставил половину JSON
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'fetched_at': time.time(), 'api_url': self.api_url, 'paradex_config': paradex_config}, f)
+        os.replace(tmp_path, self.path)
+
+    async def get(self, fetch, on_update=None):
+        """
+        Возвращает конфиг Paradex: из кеша (с фоновой перепроверкой) или через fetch().
+        fetch - корутина без аргументов, возвращающая конфиг или None.
+        on_update(fresh_config) вызывается, если фоновая перепроверка принесла другой конфиг.
+        Возвращённый словарь не меняется: его могут читать потоки пула подписи.
+        """
+        cached = self.load()
+        if cached is not None:
+            paradex_config, age = cached
+            if age < self.ttl_seconds:
+                logging.info(f"Конфигурация Paradex взята из кеша (возраст {age:.0f} с), перепроверка в фоне.")
+                self._revalidate_task = asyncio.create_task(self._revalidate(fetch, paradex_config, on_update))
+                return paradex_config
+
+        paradex_config = await fetch()
+        if paradex_config:
+            self.save(paradex_config)
+            return paradex_config
+
+        if cached is not None and cached[1] < self.max_stale_seconds:
+            logging.warning(f"Эндпоинт конфигурации недоступен, используется кеш возрастом {cached[1]:.0f} с.")
+            return cached[0]
+        return None
+
+    async def _revalidate(self, fetch, paradex_config, on_update):
+        """Загружает свежий конфиг, сохраняет его и, если он отличается, передаёт в on_update."""
+        try:
+            fresh_config = await fetch()
+        except Exception as e:
+            logging.warning(f"Фоновая перепроверка конфигурации Paradex не удалась: {e}")
+            return
+        if not fresh_config:
+            return
+        self.save(fresh_config)
+        if fresh_config != paradex_config:
+            logging.info("Конфигурация Paradex изменилась, кешированная копия обновлена.")
+            if on_update is not None:
+                on_update(fresh_config)
+
+    async def close(self):
+        if self._revalidate_task is not None and not self._revalidate_task.done():
+            self._revalidate_task.cancel()
+            await asyncio.gather(self._revalidate_task, return_exceptions=True)
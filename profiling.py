@@ -0,0 +1,150 @@
+"""
+Профилирование торговых циклов (включается ключом "profile_dir" в config.json или --profile).
+
+Каждый цикл аккаунта выполняется внутри CycleProfiler.cycle(), который через contextvars
+помечает всё, что выполняется в задаче цикла, парой (аккаунт, номер цикла). Фазы цикла
+(auth, account, order, positions, close) отмечаются CycleProfiler.phase(): для каждой
+считается реальное время, включая ожидание сервера.
+
+Профилировщик: yappi (есть в requirements.txt; понимает asyncio и разделяет статистику по
+меткам). Подпись в пуле потоков попадает в профиль своего цикла: SigningService передаёт
+потоку contextvars задачи. Пул процессов (signing_executor="process") не профилируется. Если yappi всё же не установлен, используется cProfile с
+предупреждением: только общий профиль основного потока, без разбивки по циклам. В profile_dir
+пишутся:
+  - combined.pstats - общий профиль всех циклов (смотреть через pstats/snakeviz);
+  - cycle_<аккаунт>_<цикл>.pstats - профиль отдельного цикла (только с yappi);
+  - phases.json - время по фазам: сводка и разбивка по циклам.
+Когда профилирование выключено, phase() и cycle() возвращают общий nullcontext.
+"""
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import time
+
+from metrics import Histogram
+
+try:
+    import yappi
+except ImportError:
+    yappi = None
+
+PHASES = ("auth", "account", "order", "positions", "close")
+PHASE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_NULL_CONTEXT = contextlib.nullcontext()
+_current_cycle = contextvars.ContextVar('profile_cycle', default=None)
+
+
+class CycleProfiler:
+    """
+    Параметры:
+      - output_dir: каталог для результатов; None - профилирование выключено
+    """
+
+    def __init__(self, output_dir=None):
+        self.output_dir = output_dir
+        self.enabled = bool(output_dir)
+        self.backend = None
+        self._profile = None
+        self._tags = {}  # (аккаунт, цикл) -> целочисленная метка yappi
+        self.phases = {}  # фаза -> Histogram
+        self.cycles = {}  # (аккаунт, цикл) -> {фаза: секунды, 'total': секунды}
+
+    def start(self):
+        if not self.enabled:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        if yappi is not None:
+            self.backend = 'yappi'
+            yappi.set_clock_type('wall')
+            yappi.set_tag_callback(self._current_tag)
+            yappi.start()
+        else:
+            import cProfile
+            logging.warning(
+                "yappi не установлен (pip install -r requirements.txt): профиль циклов будет неполным - "
+                "cProfile не учитывает asyncio и потоки пула подписи, профили по циклам не пишутся."
+            )
+            self.backend = 'cProfile'
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        logging.info(f"Профилирование циклов включено ({self.backend}), результаты: {self.output_dir}")
+
+    def _current_tag(self):
+        return self._tags.get(_current_cycle.get(), 0)
+
+    def cycle(self, account_index, cycle_number):
+        """Помечает текущую задачу как цикл cycle_number аккаунта account_index."""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return self._cycle(account_index, cycle_number)
+
+    @contextlib.contextmanager
+    def _cycle(self, account_index, cycle_number):
+        key = (account_index, cycle_number)
+        self._tags.setdefault(key, len(self._tags) + 1)
+        self.cycles.setdefault(key, {})
+        token = _current_cycle.set(key)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.cycles[key]['total'] = time.perf_counter() - started
+            _current_cycle.reset(token)
+
+    def phase(self, name):
+        """Отмечает фазу текущего цикла."""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return self._phase(name)
+
+    @contextlib.contextmanager
+    def _phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            histogram = self.phases.get(name)
+            if histogram is None:
+                histogram = self.phases[name] = Histogram(PHASE_BUCKETS)
+            histogram.observe(seconds)
+            cycle = self.cycles.get(_current_cycle.get())
+            if cycle is not None:
+                cycle[name] = cycle.get(name, 0.0) + seconds
+
+    def stop(self):
+        """Останавливает профилировщик и записывает результаты."""
+        if not self.enabled or self.backend is None:
+            return
+        combined_path = os.path.join(self.output_dir, "combined.pstats")
+        if self.backend == 'yappi':
+            yappi.stop()
+            stats = yappi.get_func_stats()
+            stats.save(combined_path, type='pstat')
+            for (account_index, cycle_number), tag in self._tags.items():
+                cycle_stats = yappi.get_func_stats(filter={'tag': tag})
+                if not cycle_stats.empty():
+                    cycle_stats.save(os.path.join(self.output_dir, f"cycle_{account_index}_{cycle_number}.pstats"), type='pstat')
+            yappi.clear_stats()
+        else:
+            self._profile.disable()
+            self._profile.dump_stats(combined_path)
+        self.backend = None
+
+        phases = {name: self.phases[name].snapshot() for name in PHASES if name in self.phases}
+        with open(os.path.join(self.output_dir, "phases.json"), 'w') as f:
+            json.dump({
+                'phases': phases,
+                'cycles': [
+                    {'account_index': account_index, 'cycle_number': cycle_number, **timings}
+                    for (account_index, cycle_number), timings in sorted(self.cycles.items())
+                ],
+            }, f, indent=2)
+
+        logging.info("--- Профиль циклов: время по фазам ---")
+        for name, stats in phases.items():
+            logging.info("  %-10s %d раз, всего %.2f с, среднее %.0f мс, p99 %.0f мс", name, stats['count'], stats['sum'], stats['mean'] * 1000, stats['p99'] * 1000)
+        logging.info(f"Профиль записан в {self.output_dir}")
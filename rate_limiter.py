@@ -0,0 +1,85 @@
+"""
+Клиентский ограничитель частоты запросов: token bucket на каждый класс эндпоинтов,
+общий для всех задач бота. Через него проходит каждая попытка запроса в
+RequestExecutor, поэтому одновременный старт группы аккаунтов растягивается во
+времени, а после 429 весь класс эндпоинтов делает паузу вместо лавины повторов.
+
+Лимиты задаются в config.json ключом "rate_limits":
+{"orders": {"rate": 20, "burst": 10}, ...} (rate - запросов в секунду, burst - ёмкость).
+"""
+import asyncio
+
+from clock import SystemClock
+
+# Класс эндпоинта -> (запросов в секунду, ёмкость). С запасом ниже опубликованных лимитов Paradex.
+DEFAULT_RATE_LIMITS = {
+    'public': (10.0, 5),
+    'auth': (5.0, 5),
+    'orders': (20.0, 10),
+    'private': (20.0, 10),
+}
+
+MIN_WAIT_SECONDS = 0.001
+
+ENDPOINT_CLASSES = {
+    'config': 'public',
+    'markets': 'public',
+    'time': 'public',
+    'auth': 'auth',
+    'orders': 'orders',
+    'orders_batch': 'orders',
+    'account': 'private',
+    'positions': 'private',
+}
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity, clock):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated_at = clock.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self.clock.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        # Блокировка сохраняет порядок FIFO: ждущие задачи получают токены по очереди
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                # Не меньше MIN_WAIT_SECONDS: иначе из-за округления float часы могут не сдвинуться
+                await self.clock.sleep(max((1 - self.tokens) / self.rate, MIN_WAIT_SECONDS))
+                self._refill()
+            self.tokens -= 1
+
+    def pause(self, seconds):
+        """После 429: забирает токены так, чтобы следующий появился не раньше чем через seconds."""
+        self._refill()
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+class RateLimiter:
+    def __init__(self, limits=None, clock=None):
+        self.clock = clock or SystemClock()
+        merged = dict(DEFAULT_RATE_LIMITS)
+        for endpoint_class, params in (limits or {}).items():
+            rate, burst = merged.get(endpoint_class, DEFAULT_RATE_LIMITS['private'])
+            merged[endpoint_class] = (params.get('rate', rate), params.get('burst', burst))
+        self._buckets = {
+            endpoint_class: TokenBucket(rate, burst, self.clock)
+            for endpoint_class, (rate, burst) in merged.items()
+        }
+
+    def bucket(self, endpoint):
+        return self._buckets[ENDPOINT_CLASSES.get(endpoint, 'private')]
+
+    async def acquire(self, endpoint):
+        await self.bucket(endpoint).acquire()
+
+    def pause(self, endpoint, seconds):
+        self.bucket(endpoint).pause(seconds)
@@ -0,0 +1,346 @@
+"""
+Общий исполнитель HTTP запросов к Paradex.
+
+- экспоненциальная задержка с джиттером между попытками;
+- для каждого эндпоинта свой бюджет попыток, общий лимит времени и таймаут запроса (RetryPolicy);
+- классификация ошибок: сетевые ошибки, 429 и 5xx повторяются, 401 на запрос с JWT ->
+  AuthExpiredError, остальные 4xx (и 401 самого /auth) не повторяются (ClientRequestError);
+- неидемпотентные запросы (ордера, RetryPolicy(idempotent=False)) повторяются, только если
+  они точно не приняты: 429, ошибка соединения, разомкнутый circuit breaker. Таймаут, обрыв
+  после отправки и 5xx для них - окончательный OutcomeUnknownError: ордер мог исполниться,
+  а повтор с новой подписью был бы новым ордером;
+- поддержка заголовка Retry-After;
+- circuit breaker на каждую пару (хост, прокси): аккаунт с мёртвым прокси не блокирует хост
+  для остальных аккаунтов; после паузы пропускается одна пробная попытка, остальные ждут её.
+  Ожидание breaker расходует только бюджет времени, но не попытки.
+
+Политики можно переопределить в config.json ключом "retry_policies", например
+{"orders": {"max_attempts": 2, "timeout_seconds": 5}}.
+"""
+import asyncio
+import email.utils
+import logging
+import random
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+import json_codec
+from clock import SystemClock
+from jwt_cache import AuthExpiredError
+
+
+class RequestError(Exception):
+    """Запрос не выполнен. status - HTTP статус (None для сетевых ошибок), body - тело ответа."""
+
+    def __init__(self, message, status=None, body=None):
+        super().__init__(message)
+        self.status = status
+        self.body = body
+
+
+class ClientRequestError(RequestError):
+    """4xx (кроме 429 и 401 на запрос с JWT): запрос отклонён, повторять его бессмысленно."""
+
+
+class ServerRequestError(RequestError):
+    """5xx или 429 после исчерпания бюджета попыток."""
+
+
+class TransportError(RequestError):
+    """Сетевая ошибка или таймаут после исчерпания бюджета попыток."""
+
+
+class InvalidResponseError(TransportError):
+    """2xx с телом, которое не разбирается как JSON (например, HTML страница прокси)."""
+
+
+class CircuitOpenError(RequestError):
+    """Circuit breaker разомкнут: хост (через этот прокси) недавно много раз подряд не отвечал."""
+
+
+class OutcomeUnknownError(RequestError):
+    """Неидемпотентный запрос отправлен, но ответа нет (таймаут, обрыв) или он 5xx: запрос мог быть выполнен."""
+
+
+class RetryPolicy:
+    """
+    Параметры:
+      - max_attempts: максимум попыток (включая первую)
+      - budget_seconds: общий лимит времени на все попытки
+      - timeout_seconds: таймаут одной попытки
+      - base_delay_seconds, max_delay_seconds: границы экспоненциальной задержки
+      - idempotent: можно ли повторять запрос, который мог быть уже выполнен сервером
+    """
+
+    def __init__(self, max_attempts=5, budget_seconds=60.0, timeout_seconds=10.0, base_delay_seconds=0.5, max_delay_seconds=15.0, idempotent=True):
+        self.max_attempts = max_attempts
+        self.idempotent = idempotent
+        self.budget_seconds = budget_seconds
+        self.timeout_seconds = timeout_seconds
+        self.base_delay_seconds = base_delay_seconds
+        self.max_delay_seconds = max_delay_seconds
+
+    def backoff(self, attempt):
+        """Задержка перед попыткой attempt+1 ("full jitter")."""
+        return random.uniform(0, min(self.max_delay_seconds, self.base_delay_seconds * 2 ** attempt))
+
+
+DEFAULT_POLICIES = {
+    'config': RetryPolicy(max_attempts=4, budget_seconds=30, timeout_seconds=10),
+    'markets': RetryPolicy(max_attempts=4, budget_seconds=30, timeout_seconds=10),
+    'time': RetryPolicy(max_attempts=2, budget_seconds=10, timeout_seconds=5),
+    'auth': RetryPolicy(max_attempts=5, budget_seconds=60, timeout_seconds=10),
+    'account': RetryPolicy(max_attempts=5, budget_seconds=60, timeout_seconds=10),
+    'orders': RetryPolicy(max_attempts=3, budget_seconds=20, timeout_seconds=10, idempotent=False),
+    'orders_batch': RetryPolicy(max_attempts=3, budget_seconds=20, timeout_seconds=10, idempotent=False),
+    'positions': RetryPolicy(max_attempts=5, budget_seconds=60, timeout_seconds=10),
+}
+
+
+def build_policies(overrides=None):
+    """Политики по умолчанию с переопределениями из конфига: {"orders": {"max_attempts": 2}, ...}."""
+    policies = dict(DEFAULT_POLICIES)
+    for endpoint, params in (overrides or {}).items():
+        base = policies.get(endpoint, RetryPolicy())
+        merged = dict(vars(base))
+        merged.update(params)
+        policies[endpoint] = RetryPolicy(**merged)
+    return policies
+
+
+def parse_retry_after(value, now):
+    """Retry-After в секундах: число секунд или HTTP-дата (now - текущее unix-время). None, если заголовка нет или он некорректен."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - now)
+
+
+class CircuitBreaker:
+    """
+    После failure_threshold ошибок подряд хост считается недоступным на reset_seconds, затем
+    пропускается одна пробная попытка (half-open), остальные ждут её результата по
+    HALF_OPEN_WAIT_SECONDS. Если проба так и не завершилась успехом или ошибкой (например,
+    ответ 429), через reset_seconds пропускается следующая.
+    """
+
+    HALF_OPEN_WAIT_SECONDS = 1.0
+
+    def __init__(self, failure_threshold=5, reset_seconds=30.0, clock=None):
+        self.clock = clock or SystemClock()
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started_at = None
+
+    def retry_in(self):
+        """0, если запрос можно отправлять (в half-open - только пробный), иначе через сколько секунд проверить снова."""
+        if self.opened_at is None:
+            return 0.0
+        now = self.clock.monotonic()
+        wait = self.opened_at + self.reset_seconds - now
+        if wait > 0:
+            return wait
+        if self.probe_started_at is not None and now - self.probe_started_at < self.reset_seconds:
+            return min(self.HALF_OPEN_WAIT_SECONDS, self.reset_seconds)
+        self.probe_started_at = now
+        return 0.0
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = self.clock.monotonic()
+            self.probe_started_at = None
+
+
+DEFAULT_API_URL = "https://api.testnet.paradex.trade/v1"
+
+
+class RequestExecutor:
+    """
+    base_url - адрес API, к которому добавляются относительные пути ("/auth", "/orders", ...).
+    clock - часы для задержек и бюджетов (см. clock.py); попытка запроса выполняется внутри clock.busy().
+    metrics - metrics.Metrics для задержек, статусов и повторов (необязательно).
+    rate_limiter - rate_limiter.RateLimiter, через который проходит каждая попытка (необязательно).
+    cassette_recorder - cassette.CassetteRecorder: каждый полученный ответ записывается в кассету.
+    cassette_player - cassette.CassettePlayer: ответы берутся из кассеты вместо сети.
+    clock_sync - server_clock.ServerClock: по заголовку Date каждого ответа проверяется расхождение
+    часов с сервером; если запрос отклонён (4xx) и оценка при этом исправлена, он один раз
+    повторяется сразу - prepare() подпишет его с исправленной меткой времени.
+    """
+
+    def __init__(self, policies=None, breaker_threshold=5, breaker_reset_seconds=30.0, base_url=DEFAULT_API_URL, clock=None, metrics=None,
+                 rate_limiter=None, cassette_recorder=None, cassette_player=None, clock_sync=None):
+        self.clock = clock or SystemClock()
+        self.metrics = metrics
+        self.rate_limiter = rate_limiter
+        self.cassette_recorder = cassette_recorder
+        self.cassette_player = cassette_player
+        self.clock_sync = clock_sync
+        self.base_url = base_url.rstrip('/')
+        self.policies = policies or build_policies()
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset_seconds = breaker_reset_seconds
+        self._breakers = {}
+        # Сбрасывается, если API отвечает 404/405 на /orders/batch (на время жизни исполнителя)
+        self.batch_orders_supported = True
+
+    def breaker(self, url, proxy=None):
+        key = (urlsplit(url).netloc, proxy)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(self.breaker_threshold, self.breaker_reset_seconds, self.clock)
+            self._breakers[key] = breaker
+        return breaker
+
+    def _observe(self, endpoint, started, status):
+        if self.metrics is not None:
+            self.metrics.observe_request(endpoint, time.perf_counter() - started, status)
+
+    async def request(self, session, endpoint, method, url, prepare=None, log=logging, **kwargs):
+        """
+        Выполняет запрос с повторными попытками и возвращает разобранный JSON ответа.
+        url - полный адрес или путь относительно base_url.
+        prepare() вызывается перед каждой попыткой и возвращает дополнительные аргументы
+        запроса (например, заголовки со свежей подписью и меткой времени).
+        Тело json=... кодируется json_codec сразу в bytes; ответ читается и разбирается один раз.
+        Исключения: AuthExpiredError (401 на запрос с JWT), ClientRequestError, ServerRequestError,
+        TransportError (и InvalidResponseError - 2xx не JSON), CircuitOpenError, OutcomeUnknownError (только неидемпотентные запросы).
+        """
+        if not url.startswith(('http://', 'https://')):
+            url = self.base_url + url
+        policy = self.policies.get(endpoint) or RetryPolicy()
+        breaker = self.breaker(url, kwargs.get('proxy'))
+        timeout = aiohttp.ClientTimeout(total=policy.timeout_seconds)
+        deadline = self.clock.monotonic() + policy.budget_seconds
+        attempt = 0
+        clock_resynced = False
+        while True:
+            attempt += 1
+            delay = None
+            rate_limited = False
+            clock_corrected = False
+            invalid_body = False
+            wait_for_breaker = breaker.retry_in()
+            if wait_for_breaker > 0:
+                via_proxy = " через прокси" if kwargs.get('proxy') else ""
+                error = CircuitOpenError(f"{endpoint}: хост {urlsplit(url).netloc}{via_proxy} временно недоступен")
+                if self.clock.monotonic() + wait_for_breaker > deadline:
+                    log.error("%s. Попыток: %d, бюджет повторов исчерпан.", error, attempt - 1)
+                    raise error
+                # Ожидание breaker (в том числе результата пробной попытки) не расходует попытки, только бюджет времени
+                attempt -= 1
+                log.log(logging.WARNING if wait_for_breaker > breaker.HALF_OPEN_WAIT_SECONDS else logging.DEBUG,
+                        "%s, повтор через %.2f с.", error, wait_for_breaker)
+                await self.clock.sleep(wait_for_breaker)
+                continue
+            else:
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire(endpoint)
+                started = None
+                try:
+                    with self.clock.busy():
+                        request_kwargs = dict(kwargs)
+                        if prepare is not None:
+                            request_kwargs.update(await prepare())
+                        if 'json' in request_kwargs:
+                            request_kwargs['data'] = json_codec.dumps(request_kwargs.pop('json'))
+                            headers = request_kwargs.get('headers') or {}
+                            if 'Content-Type' not in headers:
+                                request_kwargs['headers'] = dict(headers, **{'Content-Type': json_codec.JSON_CONTENT_TYPE})
+                        send = self.cassette_player.request if self.cassette_player is not None else session.request
+                        started = time.perf_counter()
+                        async with send(method, url, timeout=timeout, **request_kwargs) as response:
+                            status = response.status
+                            raw_body = await response.read()
+                            if self.cassette_recorder is not None:
+                                self.cassette_recorder.record(
+                                    endpoint, method, url, request_kwargs, status, response.headers, raw_body, time.perf_counter() - started,
+                                )
+                            if self.clock_sync is not None:
+                                clock_corrected = self.clock_sync.observe_date(response.headers.get('Date'), time.perf_counter() - started)
+                            if status < 400:
+                                try:
+                                    data = json_codec.loads(raw_body)
+                                except ValueError:
+                                    invalid_body = True
+                                else:
+                                    self._observe(endpoint, started, status)
+                                    breaker.record_success()
+                                    return data
+                            body = raw_body.decode('utf-8', 'replace')
+                            retry_after = parse_retry_after(response.headers.get('Retry-After'), self.clock.time())
+                        self._observe(endpoint, started, status)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if started is not None:
+                        self._observe(endpoint, started, 'transport')
+                    breaker.record_failure()
+                    if not policy.idempotent and started is not None and not isinstance(e, aiohttp.ClientConnectorError):
+                        # Запрос мог дойти до сервера: не соединиться - единственная сетевая ошибка, после которой он точно не выполнен
+                        error = OutcomeUnknownError(f"{endpoint}: сетевая ошибка после отправки, результат неизвестен: {e!r}")
+                        log.error("%s. Попытка %d, запрос не повторяется.", error, attempt)
+                        raise error
+                    error = TransportError(f"{endpoint}: сетевая ошибка: {e!r}")
+                else:
+                    if invalid_body:
+                        # Ответил не API (прокси, балансировщик): как сетевая ошибка
+                        breaker.record_failure()
+                        if not policy.idempotent:
+                            error = OutcomeUnknownError(f"{endpoint}: HTTP {status}, ответ не JSON, результат неизвестен: {body[:200]}", status, body)
+                            log.error("%s. Попытка %d, запрос не повторяется.", error, attempt)
+                            raise error
+                        error = InvalidResponseError(f"{endpoint}: HTTP {status}, ответ не JSON: {body[:200]}", status, body)
+                    elif status == 401 and 'Authorization' in (request_kwargs.get('headers') or {}):
+                        # Отклонён токен; 401 на запрос без токена (сам /auth) - отклонённая подпись, обычная 4xx
+                        breaker.record_success()
+                        raise AuthExpiredError(f"{endpoint}: HTTP 401: {body}")
+                    elif status == 429:
+                        error = ServerRequestError(f"{endpoint}: HTTP 429 (превышен лимит запросов)", status, body)
+                        delay = retry_after
+                        rate_limited = True
+                    elif status >= 500:
+                        breaker.record_failure()
+                        if not policy.idempotent:
+                            error = OutcomeUnknownError(f"{endpoint}: HTTP {status}, результат неизвестен: {body}", status, body)
+                            log.error("%s. Попытка %d, запрос не повторяется.", error, attempt)
+                            raise error
+                        error = ServerRequestError(f"{endpoint}: HTTP {status}: {body}", status, body)
+                        delay = retry_after
+                    elif clock_corrected and prepare is not None and not clock_resynced:
+                        # Вероятно, отклонена метка времени: подписываем заново по исправленным часам
+                        breaker.record_success()
+                        clock_resynced = True
+                        error = ClientRequestError(f"{endpoint}: HTTP {status}: {body}", status, body)
+                        delay = 0.0
+                    else:
+                        # Хост отвечает, значит он жив; сам запрос отклонён
+                        breaker.record_success()
+                        raise ClientRequestError(f"{endpoint}: HTTP {status}: {body}", status, body)
+
+            if delay is None:
+                delay = policy.backoff(attempt - 1)
+            if rate_limited and self.rate_limiter is not None:
+                # Пауза для всего класса эндпоинтов, а не только для этой задачи
+                self.rate_limiter.pause(endpoint, delay)
+            if attempt >= policy.max_attempts or self.clock.monotonic() + delay > deadline:
+                log.error("%s. Попыток: %d, бюджет повторов исчерпан.", error, attempt)
+                raise error
+            log.warning("%s. Попытка %d/%d, повтор через %.2f с.", error, attempt, policy.max_attempts, delay)
+            if self.metrics is not None:
+                self.metrics.record_retry(endpoint)
+            await self.clock.sleep(delay)
@@ -0,0 +1,113 @@
+"""
+Журнал прогона бота для восстановления после падения.
+
+Каждое событие (старт прогона, распределение по группам, отработанная группа,
+размещённый ордер, закрытие позиций, конец цикла) дописывается отдельной JSON
+строкой в файл и сразу сбрасывается на диск (fsync), поэтому после падения в журнале
+есть всё, что успело произойти. Запись и fsync выполняются в отдельном потоке, чтобы не
+останавливать event loop; события пишутся по одному и в порядке вызова record(). При запуске с --resume журнал проигрывается в
+RunState: с какого цикла и группы продолжать и у каких аккаунтов могли остаться
+открытые позиции.
+"""
+import asyncio
+import json
+import logging
+import os
+
+from clock import SystemClock
+
+RUN_JOURNAL_FILE = "run_journal.jsonl"
+
+
+class RunState:
+    """Состояние прогона, восстановленное из журнала."""
+
+    def __init__(self):
+        self.addresses = []
+        self.cycles_per_account = None
+        self.finished = False
+        self.cycle = 0  # номер текущего (незавершённого) цикла
+        self.groups = None  # [[(account_index, order_side), ...], ...] текущего цикла
+        self.groups_done = set()
+        self.open_accounts = {}  # account_index -> множество рынков с возможно открытыми позициями
+
+    def apply(self, event):
+        kind = event.get('event')
+        if kind == 'run_started':
+            self.__init__()
+            self.addresses = event['addresses']
+            self.cycles_per_account = event['cycles_per_account']
+        elif kind == 'groups':
+            self.cycle = event['cycle']
+            self.groups = [[tuple(member) for member in group] for group in event['groups']]
+            self.groups_done = set()
+        elif kind == 'group_done':
+            self.groups_done.add(event['group'])
+        elif kind == 'cycle_done':
+            self.cycle = event['cycle'] + 1
+            self.groups = None
+            self.groups_done = set()
+        elif kind == 'order_placed':
+            self.open_accounts.setdefault(event['account_index'], set()).add(event['market'])
+        elif kind == 'positions_closed':
+            markets = self.open_accounts.get(event['account_index'], set())
+            markets.discard(event['market'])
+            if not markets:
+                self.open_accounts.pop(event['account_index'], None)
+        elif kind == 'run_finished':
+            self.finished = True
+
+
+class RunJournal:
+    """
+    Параметры:
+      - path: файл журнала (JSONL)
+      - clock: часы для меток времени событий
+    """
+
+    def __init__(self, path=RUN_JOURNAL_FILE, clock=None):
+        self.path = path
+        self.clock = clock or SystemClock()
+        self._file = None
+        self._lock = asyncio.Lock()
+
+    def load(self):
+        """Проигрывает журнал и возвращает RunState или None, если журнала нет или он пуст."""
+        state = RunState()
+        events = 0
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        state.apply(json.loads(line))
+                    except (json.JSONDecodeError, KeyError, TypeError) as e:
+                        # Последняя строка могла быть записана не до конца в момент падения
+                        logging.warning(f"Журнал '{self.path}': пропущена повреждённая запись: {e}")
+                        continue
+                    events += 1
+        except FileNotFoundError:
+            return None
+        return state if events and state.cycles_per_account is not None else None
+
+    def open(self, resume=False):
+        """Открывает журнал на дозапись (resume=True) или начинает его заново."""
+        self._file = open(self.path, 'a' if resume else 'w')
+
+    async def record(self, event, **fields):
+        """Дописывает событие и возвращается, когда оно сброшено на диск."""
+        if self._file is None:
+            return
+        line = json.dumps({'ts': self.clock.time(), 'event': event, **fields}) + '\n'
+        async with self._lock:
+            with self.clock.busy():
+                await asyncio.to_thread(self._append, line)
+
+    def _append(self, line):
+        self._file.write(line)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,109 @@
+"""
+Время сервера Paradex для меток времени в подписях.
+
+ServerClock оборачивает обычные часы (clock.py) и добавляет к time() оценку расхождения
+с сервером. Оценка берётся из /v1/system/time: по нескольким замерам выбирается замер с
+наименьшим временем ответа, серверное время сопоставляется с серединой запроса. Между
+замерами расхождение проверяется по заголовку Date каждого ответа: Date (точность 1 с)
+вместе с временем отправки и получения запроса задаёт интервал, в котором лежит
+расхождение. Если текущая оценка выходит за этот интервал, она сдвигается в его середину.
+Ответы, шедшие дольше DATE_HEADER_MAX_ELAPSED_SECONDS, не учитываются: интервал по ним
+слишком широк. Так же оценка работает, если /v1/system/time недоступен.
+
+monotonic(), sleep() и busy() передаются базовым часам без изменений.
+"""
+import email.utils
+import logging
+
+from clock import SystemClock
+
+# Date по медленным ответам не учитывается
+DATE_HEADER_MAX_ELAPSED_SECONDS = 1.0
+# Запас на округление и разрешение часов при сравнении оценки с интервалом по Date
+DATE_HEADER_SLACK_SECONDS = 0.5
+
+
+class ServerClock:
+    """
+    Параметры:
+      - base: базовые часы (SystemClock или VirtualClock)
+      - samples: число замеров /v1/system/time при синхронизации
+    """
+
+    def __init__(self, base=None, samples=3):
+        self.base = base or SystemClock()
+        self.samples = samples
+        self.offset = 0.0
+        self.synced = False
+
+    def time(self):
+        return self.base.time() + self.offset
+
+    def monotonic(self):
+        return self.base.monotonic()
+
+    async def sleep(self, seconds):
+        await self.base.sleep(seconds)
+
+    def busy(self):
+        return self.base.busy()
+
+    def _set_offset(self, offset, source):
+        if abs(offset - self.offset) >= 1.0 or not self.synced:
+            level = logging.WARNING if abs(offset) >= 1.0 else logging.INFO
+            logging.log(level, "Расхождение часов с сервером Paradex: %+.3f с (по %s).", offset, source)
+        self.offset = offset
+        self.synced = True
+
+    async def sync(self, fetch_server_time):
+        """
+        Оценивает расхождение по /v1/system/time.
+        fetch_server_time - корутина без аргументов -> серверное unix-время в секундах или None.
+        Возвращает True, если удалось получить хотя бы один замер.
+        """
+        best = None
+        for _ in range(self.samples):
+            sent_at = self.base.time()
+            server_time = await fetch_server_time()
+            received_at = self.base.time()
+            if server_time is None:
+                break
+            round_trip = received_at - sent_at
+            if best is None or round_trip < best[0]:
+                best = (round_trip, server_time - (sent_at + received_at) / 2)
+        if best is None:
+            logging.warning("Не удалось получить время сервера, расхождение часов оценивается по заголовкам Date.")
+            return False
+        self._set_offset(best[1], "/system/time")
+        return True
+
+    def observe_date(self, date_header, elapsed_seconds):
+        """
+        Проверяет оценку по заголовку Date только что полученного ответа.
+        elapsed_seconds - сколько шёл запрос (от отправки до получения ответа).
+        True - оценка исправлена.
+        """
+        if not date_header or elapsed_seconds > DATE_HEADER_MAX_ELAPSED_SECONDS:
+            return False
+        try:
+            server_time = email.utils.parsedate_to_datetime(date_header).timestamp()
+        except (TypeError, ValueError):
+            return False
+        received_at = self.base.time()
+        sent_at = received_at - elapsed_seconds
+        # Ответ сформирован между отправкой и получением, в пределах секунды [Date, Date + 1)
+        lowest = server_time - received_at
+        highest = server_time + 1 - sent_at
+        if lowest - DATE_HEADER_SLACK_SECONDS <= self.offset <= highest + DATE_HEADER_SLACK_SECONDS:
+            return False
+        self._set_offset((lowest + highest) / 2, "заголовку Date")
+        return True
+
+    async def run(self, fetch_server_time, interval_seconds):
+        """Периодическая пересинхронизация (запускается отдельной задачей)."""
+        while True:
+            await self.base.sleep(interval_seconds)
+            try:
+                await self.sync(fetch_server_time)
+            except Exception as e:
+                logging.warning(f"Синхронизация часов с сервером не удалась: {e}")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Симуляция работы бота в сжатом времени.
+
+Бот целиком (run_bot: группы, циклы, все задержки) прогоняется против локального
+mock_server.MockParadex на виртуальных часах: задержки между сделками, группами и
+циклами проходят мгновенно, а реальными остаются только CPU (подпись, JSON, логи) и
+локальный I/O. В конце печатается реальная стоимость одного торгового цикла.
+
+С --record HTTP обмен с mock сервером записывается в кассету, с --replay FILE бот
+прогоняется по кассете (в том числе записанной против настоящего API) без сервера:
+аккаунты берутся из кассеты, ответы приходят с исходными задержками.
+
+Запуск:
+    python simulation.py --accounts 6 --cycles 3 --seed 1 [--error-rate 0.05 --rate-limit-rate 0.05] [--clock-skew -120]
+    python simulation.py --cycles 3 --replay cassette.jsonl
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+
+from starknet_py.constants import EC_ORDER
+
+import paradex_bot
+from bot_logging import setup_logging
+from cassette import CassettePlayer
+from clock import VirtualClock
+from mock_server import MockParadex, public_keys_from_wallets, start_mock_server
+
+
+def generate_wallets(count, rng):
+    """Детерминированные тестовые кошельки (адрес случайный, ключ в допустимом диапазоне)."""
+    return [
+        {'address': hex(rng.getrandbits(250)), 'private_key': hex(rng.randrange(1, EC_ORDER))}
+        for _ in range(count)
+    ]
+
+
+async def replay(config, seed):
+    """Прогон бота по кассете (config['http_cassette_file']) на виртуальных часах."""
+    random.seed(seed)
+    rng = random.Random(seed)
+    accounts = CassettePlayer(config['http_cassette_file']).accounts
+    # Подписи при воспроизведении не проверяются, ключи нужны только для расчёта подписи
+    wallets = [dict(wallet, address=address) for wallet, address in zip(generate_wallets(len(accounts), rng), accounts)]
+    clock = VirtualClock()
+    config = dict(config, use_websocket=False, http_cassette_mode='replay')
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    await paradex_bot.run_bot(config, wallets, [None] * len(wallets), [], clock=clock)
+    return {
+        'virtual_seconds': clock.elapsed,
+        'wall_seconds': time.perf_counter() - wall_started,
+        'cpu_seconds': time.process_time() - cpu_started,
+    }
+
+
+async def simulate(config, accounts, seed, latency_ms, error_rate, rate_limit_rate, clock_skew_seconds=0.0):
+    rng = random.Random(seed)
+    random.seed(seed)
+    wallets = generate_wallets(accounts, rng)
+    clock = VirtualClock()
+    mock = MockParadex(
+        public_keys=public_keys_from_wallets(wallets),
+        latency_ms=latency_ms,
+        error_rate=error_rate,
+        rate_limit_rate=rate_limit_rate,
+        seed=seed,
+        clock=clock,
+        clock_skew_seconds=clock_skew_seconds,
+    )
+    runner, base_url = await start_mock_server(mock)
+    config = dict(config, api_url=base_url, use_websocket=False)
+    try:
+        wall_started = time.perf_counter()
+        cpu_started = time.process_time()
+        await paradex_bot.run_bot(config, wallets, [None] * accounts, [], clock=clock)
+        wall_seconds = time.perf_counter() - wall_started
+        cpu_seconds = time.process_time() - cpu_started
+    finally:
+        await runner.cleanup()
+    return {
+        'virtual_seconds': clock.elapsed,
+        'wall_seconds': wall_seconds,
+        'cpu_seconds': cpu_seconds,
+        'orders': len(mock.orders),
+        'mock_stats': mock.stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Симуляция бота на виртуальных часах против локального Paradex")
+    parser.add_argument("--accounts", type=int, default=6)
+    parser.add_argument("--cycles", type=int, default=3, help="циклов на аккаунт")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--latency-ms", type=float, nargs=2, default=(0, 0), metavar=("MIN", "MAX"), help="реальная задержка ответов mock сервера")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--clock-skew", type=float, default=0.0, help="на сколько секунд часы mock сервера опережают часы бота")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--profile", metavar="DIR", help="профилировать торговые циклы (см. profiling.py)")
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument("--record", metavar="FILE", help="записать HTTP обмен с mock сервером в кассету")
+    cassette.add_argument("--replay", metavar="FILE", help="прогнать бота по кассете вместо mock сервера")
+    args = parser.parse_args()
+
+    config = paradex_bot.load_config()
+    if not config:
+        return
+    cache_dir = tempfile.mkdtemp(prefix="paradex_sim_")
+    config.update(
+        cycles_per_account=[args.cycles, args.cycles],
+        log_level=args.log_level,
+        paradex_config_cache_file=os.path.join(cache_dir, "paradex_config_cache.json"),
+        journal_file=os.path.join(cache_dir, "run_journal.jsonl"),
+    )
+    setup_logging(args.log_level)
+    if args.profile:
+        config.update(profile_dir=args.profile)
+
+    if args.replay:
+        config.update(http_cassette_file=args.replay)
+        result = asyncio.run(replay(config, args.seed))
+        logging.warning(
+            "Воспроизведение кассеты: виртуальное время %.0f с, реальное %.2f с, CPU %.2f с",
+            result['virtual_seconds'], result['wall_seconds'], result['cpu_seconds'],
+        )
+        return
+    if args.record:
+        config.update(http_cassette_mode='record', http_cassette_file=args.record)
+
+    result = asyncio.run(simulate(
+        config, args.accounts, args.seed, tuple(args.latency_ms), args.error_rate, args.rate_limit_rate, args.clock_skew,
+    ))
+    trade_cycles = args.accounts * args.cycles
+    logging.warning(
+        "Симуляция: %d аккаунтов x %d циклов, виртуальное время %.0f с, реальное %.2f с, CPU %.2f с "
+        "(%.1f мс CPU на торговый цикл), ордеров: %d, mock: %s",
+        args.accounts, args.cycles, result['virtual_seconds'], result['wall_seconds'], result['cpu_seconds'],
+        result['cpu_seconds'] / trade_cycles * 1000, result['orders'], result['mock_stats'],
+    )
+
+
+if __name__ == "__main__":
+    main()
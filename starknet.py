@@ -1,17 +1,157 @@
-from starknet_py.common import int_from_bytes
-from starknet_py.utils.typed_data import TypedData
-from starknet_py.constants import EC_ORDER  # Если такая константа доступна в вашей версии
-from starknet_crypto_py import sign as rs_sign
-import json
+# starknet_py и starknet_crypto_py импортируются лениво (load_crypto), при первой подписи:
+# их загрузка занимает заметную часть запуска, а ошибки в config.json или кошельках
+# должны находиться до неё.
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import contextvars
+import functools
 import logging
+import os
+import time
+
+from bot_logging import LazyJson
+from market_cache import to_felt_amount
+
+# --- Схемы TypedData Paradex ---
+STARKNET_DOMAIN_TYPE = [
+    {"name": "name", "type": "felt"},
+    {"name": "chainId", "type": "felt"},
+    {"name": "version", "type": "felt"},
+]
+
+PRIMARY_TYPES = {
+    "Request": [
+        {"name": "method", "type": "felt"},
+        {"name": "path", "type": "felt"},
+        {"name": "body", "type": "felt"},
+        {"name": "timestamp", "type": "felt"},
+        {"name": "expiration", "type": "felt"},
+    ],
+    "Order": [
+        {"name": "timestamp", "type": "felt"},
+        {"name": "market", "type": "felt"},
+        {"name": "side", "type": "felt"},
+        {"name": "orderType", "type": "felt"},
+        {"name": "size", "type": "felt"},
+        {"name": "price", "type": "felt"},
+    ],
+}
+
+# encode_shortstring("StarkNet Message")
+STARKNET_MESSAGE_PREFIX = int.from_bytes(b"StarkNet Message", "big")
+
+
+def load_crypto():
+    """Импортирует криптографические зависимости (повторный вызов ничего не стоит). Возвращает время загрузки в секундах."""
+    started = time.perf_counter()
+    import starknet_crypto_py  # noqa: F401
+    import starknet_py.hash.utils  # noqa: F401
+    import starknet_py.utils.typed_data  # noqa: F401
+    return time.perf_counter() - started
+
+
+def build_typed_data(primary_type: str, chain_id: int, message: dict) -> dict:
+    """Собирает полный словарь TypedData Paradex (схема как в build_auth_message из доков)."""
+    return {
+        "domain": {"name": "Paradex", "chainId": hex(chain_id), "version": "1"},
+        "primaryType": primary_type,
+        "types": {
+            "StarkNetDomain": STARKNET_DOMAIN_TYPE,
+            primary_type: PRIMARY_TYPES[primary_type],
+        },
+        "message": message,
+    }
+
+
+class PrecompiledTypedData:
+    """
+    Предвычисленный хешер TypedData для пары (chain_id, аккаунт).
+    Хеши типов, домена и префикс сообщения считаются один раз в конструкторе,
+    на каждый вызов хешируются только поля сообщения.
+    Результат совпадает с TypedData.message_hash.
+    """
+
+    def __init__(self, primary_type: str, chain_id: int, account_address: int):
+        from starknet_py.hash.utils import pedersen_hash
+        from starknet_py.utils.typed_data import TypedData, get_hex
+
+        self._pedersen_hash = pedersen_hash
+        self._get_hex = get_hex
+        self.primary_type = primary_type
+        self.field_names = [field["name"] for field in PRIMARY_TYPES[primary_type]]
+
+        # Эталонный TypedData используется только для вычисления констант
+        empty_message = {name: 0 for name in self.field_names}
+        reference = TypedData.from_dict(build_typed_data(primary_type, chain_id, empty_message))
+        self.type_hash = reference.type_hash(primary_type)
+        domain_hash = reference.struct_hash("StarkNetDomain", reference.domain)
+
+        # compute_hash_on_elements - это свёртка слева от 0, поэтому
+        # начало цепочки [prefix, domain_hash, account] можно посчитать заранее
+        state = pedersen_hash(0, STARKNET_MESSAGE_PREFIX)
+        state = pedersen_hash(state, domain_hash)
+        self._message_prefix_state = pedersen_hash(state, account_address)
+        self._struct_prefix_state = pedersen_hash(0, self.type_hash)
+        self._struct_length = len(self.field_names) + 1
+
+    def struct_hash(self, message: dict) -> int:
+        pedersen_hash = self._pedersen_hash
+        state = self._struct_prefix_state
+        for name in self.field_names:
+            state = pedersen_hash(state, int(self._get_hex(message[name]), 16))
+        return pedersen_hash(state, self._struct_length)
+
+    def message_hash(self, message: dict) -> int:
+        state = self._pedersen_hash(self._message_prefix_state, self.struct_hash(message))
+        return self._pedersen_hash(state, 4)
+
+
+@functools.lru_cache(maxsize=None)
+def get_typed_data_hasher(primary_type: str, starknet_chain_id: str, account_address: str) -> PrecompiledTypedData:
+    """
+    Возвращает закешированный хешер для (primary_type, chain_id, аккаунт). Кеш без ограничения:
+    ключей не больше, чем кошельков x 2 типа, а с ограничением большой набор кошельков
+    вытеснял бы хешеры на каждом цикле.
+    """
+    chain_id = int.from_bytes(starknet_chain_id.encode(), "big")
+    return PrecompiledTypedData(primary_type, chain_id, int(account_address, 16))
+
 
 def message_signature(msg_hash: int, priv_key: int) -> tuple[int, int]:
     import random # Импортируем random здесь, если еще не импортирован
+    from starknet_py.constants import EC_ORDER
+    from starknet_crypto_py import sign as rs_sign
     k = random.randint(1, EC_ORDER - 1) # <---- Генерируем случайное k
-    logging.info(f"message_signature: msg_hash = {msg_hash}") # <---- Лог msg_hash внутри функции
+    logging.debug("message_signature: msg_hash = %s", msg_hash)
     return rs_sign(private_key=priv_key, msg_hash=msg_hash, k=k) # <---- Передаем k
 
 
+def build_auth_message(timestamp: int, expiration: int) -> dict:
+    """Поля сообщения Request для POST /v1/auth."""
+    return {
+        "method": "POST",
+        "path": "/v1/auth",
+        "body": "",
+        "timestamp": timestamp,
+        "expiration": expiration,
+    }
+
+
+def build_order_message(order_params: dict) -> dict:
+    """Поля сообщения Order из параметров ордера (в том же виде, в каком они уходят в API)."""
+    return {
+        "timestamp": str(order_params['signature_timestamp']),
+        # При необходимости можно преобразовать строку в felt (например, используя encode_shortstring)
+        "market": order_params['market'],
+        # Преобразуем сторону в строковое представление: "1" для BUY, "2" для SELL
+        "side": order_params['side'],
+        "orderType": order_params['type'],
+        # Размер и цена подписываются как целые в единицах 10^-8 (точно, без float)
+        "size": str(to_felt_amount(order_params['size'])),
+        "price": str(to_felt_amount(order_params.get('price', 0))),
+    }
+
+
 def generate_starknet_auth_signature(account_address: str, timestamp: int, expiration: int, private_key_hex: str, paradex_config: dict) -> list[str]:
     """
     Генерирует подпись для аутентификации в соответствии с документацией Paradex.
@@ -21,40 +161,8 @@ def generate_starknet_auth_signature(account_address: str, timestamp: int, expir
       - private_key_hex: приватный ключ (уже выведенный для StarkNet) в hex-формате
       - paradex_config: конфигурация с параметром "starknet_chain_id"
     """
-    chain_id = int_from_bytes(paradex_config["starknet_chain_id"].encode())
-
-    # Формирование сообщения (схема как в build_auth_message из доков)
-    auth_msg = {
-        "message": {
-            "method": "POST",
-            "path": "/v1/auth",
-            "body": "",
-            "timestamp": timestamp,
-            "expiration": expiration,
-        },
-        "domain": {"name": "Paradex", "chainId": hex(chain_id), "version": "1"},
-        "primaryType": "Request",
-        "types": {
-            "StarkNetDomain": [
-                {"name": "name", "type": "felt"},
-                {"name": "chainId", "type": "felt"},
-                {"name": "version", "type": "felt"},
-            ],
-            "Request": [
-                {"name": "method", "type": "felt"},
-                {"name": "path", "type": "felt"},
-                {"name": "body", "type": "felt"},
-                {"name": "timestamp", "type": "felt"},
-                {"name": "expiration", "type": "felt"},
-            ],
-        },
-    }
-
-    # Создаём объект TypedData из сообщения
-    typed_data = TypedData.from_dict(auth_msg)
-    # Преобразуем адрес аккаунта в int (если передан в виде hex-строки)
-    account_int = int(account_address, 16)
-    msg_hash = typed_data.message_hash(account_int)
+    hasher = get_typed_data_hasher("Request", paradex_config["starknet_chain_id"], account_address)
+    msg_hash = hasher.message_hash(build_auth_message(timestamp, expiration))
 
     priv_key = int(private_key_hex, 16)
     r, s = message_signature(msg_hash, priv_key)
@@ -69,52 +177,107 @@ def generate_starknet_order_signature(order_params: dict, private_key_hex: str,
     Генерирует подпись для ордера согласно документации Paradex.
     ... (описание функции) ...
     """
-    chain_id = int_from_bytes(paradex_config["starknet_chain_id"].encode())
-    logging.info(f"generate_starknet_order_signature: chain_id = {chain_id}") # <----  Лог chain_id
-
-    order_msg = {
-        "domain": {"name": "Paradex", "chainId": hex(chain_id), "version": "1"}, # <----  chainId ОСТАЕТСЯ ИЗ КОНФИГА (проверьте правильность!)
-        "primaryType": "Order",
-        "types": {
-            "StarkNetDomain": [
-                {"name": "name", "type": "felt"},
-                {"name": "chainId", "type": "felt"},
-                {"name": "version", "type": "felt"},
-            ],
-            "Order": [
-                {"name": "timestamp", "type": "felt"},
-                {"name": "market", "type": "felt"},
-                {"name": "side", "type": "felt"},
-                {"name": "orderType", "type": "felt"},
-                {"name": "size", "type": "felt"},
-                {"name": "price", "type": "felt"},
-            ],
-        },
-        "message": {
-            "timestamp": str(order_params['signature_timestamp']),
-            # При необходимости можно преобразовать строку в felt (например, используя encode_shortstring)
-            "market": order_params['market'],
-            # Преобразуем сторону в строковое представление: "1" для BUY, "2" для SELL
-            "side": order_params['side'],
-            "orderType": order_params['type'],
-            "size": str(int(float(order_params['size']))),
-            "price": str(int(float(order_params.get('price', 0)))),
-        },
-    }
-
-    logging.info(f"TypedData для ордера (JSON):\n{json.dumps(order_msg, indent=2)}") # <---- Лог order_msg
-    typed_data = TypedData.from_dict(order_msg)
-    account_int = int(account_address, 16)
-    msg_hash = typed_data.message_hash(account_int)
-
-    logging.info(f"Message Hash для ордера: {msg_hash}") # <---- Лог Message Hash
+    hasher = get_typed_data_hasher("Order", paradex_config["starknet_chain_id"], account_address)
+    order_msg = build_order_message(order_params)
+    logging.debug("Сообщение ордера (JSON):\n%s", LazyJson(order_msg, indent=2))
+    msg_hash = hasher.message_hash(order_msg)
+    logging.debug("Message Hash для ордера: %s", msg_hash)
 
     priv_key_int = int(private_key_hex, 16) # Явное преобразование в integer
-    logging.info(f"generate_starknet_order_signature: priv_key_int = {priv_key_int}") # <---- Лог priv_key_int
-
     r, s = message_signature(msg_hash, priv_key_int)
-    logging.info(f"Подпись (r, s) перед flatten: r={r}, s={s}") # <---- Лог r и s
+    logging.debug("Подпись (r, s) перед flatten: r=%s, s=%s", r, s)
 
     sig = [str(r), str(s)]
     signature_str = flatten_signature(sig)
-    return signature_str
\ No newline at end of file
+    return signature_str
+
+
+# --- Асинхронный сервис подписи ---
+SIGNERS = {
+    "auth": generate_starknet_auth_signature,
+    "order": generate_starknet_order_signature,
+}
+
+
+def _sign_many(requests: list[tuple[str, tuple]]) -> list:
+    """Подписывает пачку запросов в одном потоке/процессе пула."""
+    return [SIGNERS[kind](*args) for kind, args in requests]
+
+
+class SigningService:
+    """
+    Выносит хеширование Pedersen и подпись из event loop в пул потоков или процессов.
+    Параметры:
+      - executor_type: "thread" или "process"
+      - max_workers: размер пула (по умолчанию число CPU)
+      - metrics: metrics.Metrics для длительностей подписи, включая ожидание в очереди пула (необязательно)
+    """
+
+    def __init__(self, executor_type: str = "thread", max_workers: int | None = None, metrics=None):
+        self.metrics = metrics
+        self.max_workers = max_workers or os.cpu_count() or 1
+        if executor_type == "process":
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        elif executor_type == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="signer")
+        else:
+            raise ValueError(f"Неизвестный тип пула подписи: {executor_type}")
+        self.executor_type = executor_type
+
+    async def _run(self, kind, func, *args):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        if self.executor_type == "thread":
+            # Как asyncio.to_thread: поток пула видит contextvars задачи (метка цикла для профиля yappi)
+            func = functools.partial(contextvars.copy_context().run, func)
+        result = await loop.run_in_executor(self._executor, func, *args)
+        if self.metrics is not None:
+            self.metrics.observe_signing(kind, time.perf_counter() - started)
+        return result
+
+    async def sign_auth(self, account_address: str, timestamp: int, expiration: int, private_key_hex: str, paradex_config: dict) -> list[str]:
+        return await self._run("auth", generate_starknet_auth_signature, account_address, timestamp, expiration, private_key_hex, paradex_config)
+
+    async def sign_order(self, order_params: dict, private_key_hex: str, paradex_config: dict, account_address: str) -> str:
+        return await self._run("order", generate_starknet_order_signature, dict(order_params), private_key_hex, paradex_config, account_address)
+
+    async def sign_batch(self, requests: list[tuple[str, tuple]]) -> list:
+        """
+        Подписывает пачку запросов вида ("auth" | "order", args) и возвращает подписи в том же порядке.
+        Пачка делится на части по числу воркеров, каждая часть - одна задача пула.
+        """
+        if not requests:
+            return []
+        chunk_size = -(-len(requests) // self.max_workers)
+        chunks = [requests[i:i + chunk_size] for i in range(0, len(requests), chunk_size)]
+        results = await asyncio.gather(*(self._run("batch", _sign_many, chunk) for chunk in chunks))
+        return [signature for chunk_result in results for signature in chunk_result]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+_signing_service = None
+
+
+def configure_signing_service(executor_type: str = "thread", max_workers: int | None = None, metrics=None) -> SigningService:
+    """Создаёт общий сервис подписи (старый пул, если был, закрывается)."""
+    global _signing_service
+    if _signing_service is not None:
+        _signing_service.shutdown()
+    _signing_service = SigningService(executor_type, max_workers, metrics)
+    return _signing_service
+
+
+def get_signing_service() -> SigningService:
+    """Возвращает общий сервис подписи, по умолчанию - пул потоков."""
+    if _signing_service is None:
+        return configure_signing_service()
+    return _signing_service
+
+
+def shutdown_signing_service():
+    global _signing_service
+    if _signing_service is not None:
+        _signing_service.shutdown()
+        _signing_service = None
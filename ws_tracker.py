@@ -0,0 +1,168 @@
+"""
+Отслеживание позиций, ордеров и исполнений через WebSocket Paradex.
+
+Для каждого аккаунта держится одно WS соединение с подписками на каналы
+positions, orders.ALL и fills.ALL. Состояние позиций хранится в памяти и читается
+торговым циклом вместо REST запроса /v1/positions. Пока соединение не установлено
+или после обрыва (когда часть обновлений могла потеряться) состояние считается
+неактуальным: цикл берёт позиции через REST и заново засевает ими трекер. Соединение
+считается установленным только после того, как сервер подтвердил авторизацию и все подписки.
+"""
+import asyncio
+import collections
+import logging
+
+import aiohttp
+
+import json_codec
+from clock import SystemClock
+
+WS_URL = "wss://ws.api.testnet.paradex.trade/v1"
+CHANNELS = ("positions", "orders.ALL", "fills.ALL")
+
+
+class AccountStream:
+    """Состояние одного аккаунта, собранное из WS сообщений."""
+
+    def __init__(self, clock=None):
+        self.clock = clock or SystemClock()
+        self.positions = {}  # id позиции (или рынок) -> позиция
+        self.orders = {}  # id ордера -> последнее состояние ордера
+        self.fills = collections.deque(maxlen=200)
+        self.connected = False
+        self.seeded = False
+        self.last_message_at = None
+
+    def apply(self, channel, data):
+        self.last_message_at = self.clock.time()
+        if channel == "positions":
+            self.positions[data.get('id') or data.get('market')] = data
+        elif channel.startswith("orders."):
+            self.orders[data.get('id')] = data
+        elif channel.startswith("fills."):
+            self.fills.append(data)
+
+    def seed(self, rest_positions):
+        """Объединяет позиции из REST с уже пришедшими по WS: побеждает более свежая (last_updated_at)."""
+        positions = {
+            position.get('id') or position.get('market'): position
+            for position in rest_positions.get('results', [])
+        }
+        for key, position in self.positions.items():
+            rest_position = positions.get(key)
+            if rest_position is None or position.get('last_updated_at', 0) >= rest_position.get('last_updated_at', 0):
+                positions[key] = position
+        self.positions = positions
+        self.seeded = True
+
+    def snapshot(self):
+        """Позиции в формате ответа REST /v1/positions (только открытые)."""
+        return {'results': [
+            position for position in self.positions.values()
+            if position.get('status', 'OPEN') != 'CLOSED'
+        ]}
+
+
+class PositionTracker:
+    """
+    Параметры:
+      - sessions: SessionManager (WS соединения открываются в сессиях аккаунтов)
+      - token_cache: JwtTokenCache для авторизации в WS
+      - ws_url: адрес WebSocket API
+      - clock: часы для задержки переподключения и меток времени сообщений (см. clock.py)
+    """
+
+    def __init__(self, sessions, token_cache, ws_url=WS_URL, reconnect_delay_seconds=5.0, clock=None):
+        self.clock = clock or SystemClock()
+        self.sessions = sessions
+        self.token_cache = token_cache
+        self.ws_url = ws_url
+        self.reconnect_delay_seconds = reconnect_delay_seconds
+        self._streams = {}
+        self._tasks = {}
+
+    def start(self, account_data):
+        """Запускает WS поток аккаунта, если он ещё не запущен."""
+        account_index = account_data['account_index']
+        if account_index not in self._streams:
+            self._streams[account_index] = AccountStream(self.clock)
+        task = self._tasks.get(account_index)
+        if task is None or task.done():
+            self._tasks[account_index] = asyncio.create_task(self._run(account_data, self._streams[account_index]))
+
+    def positions(self, account_data):
+        """Актуальные позиции аккаунта или None, если нужно обратиться к REST."""
+        stream = self._streams.get(account_data['account_index'])
+        if stream is None or not (stream.connected and stream.seeded):
+            return None
+        return stream.snapshot()
+
+    def seed(self, account_data, rest_positions):
+        """Засевает состояние позициями из REST. Имеет смысл только при живом соединении."""
+        stream = self._streams.get(account_data['account_index'])
+        if stream is not None and stream.connected and rest_positions is not None:
+            stream.seed(rest_positions)
+
+    def order_status(self, account_data, order_id):
+        stream = self._streams.get(account_data['account_index'])
+        if stream is None or order_id is None:
+            return None
+        order = stream.orders.get(order_id)
+        return order.get('status') if order else None
+
+    async def _run(self, account_data, stream):
+        log_prefix = f"Аккаунт {account_data['account_index']}: WS"
+        while True:
+            try:
+                await self._connect(account_data, stream)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"{log_prefix}: соединение прервано: {e!r}")
+            finally:
+                stream.connected = False
+                stream.seeded = False
+            await self.clock.sleep(self.reconnect_delay_seconds)
+
+    async def _connect(self, account_data, stream):
+        session = self.sessions.for_account(account_data)
+        jwt_token = await self.token_cache.get(account_data, session)
+        if not jwt_token:
+            raise RuntimeError("нет JWT токена для авторизации")
+        async with session.ws_connect(self.ws_url, proxy=account_data['proxy'], heartbeat=30) as ws:
+            await ws.send_json({"jsonrpc": "2.0", "method": "auth", "params": {"bearer": jwt_token}, "id": 0})
+            for request_id, channel in enumerate(CHANNELS, start=1):
+                await ws.send_json({"jsonrpc": "2.0", "method": "subscribe", "params": {"channel": channel}, "id": request_id})
+            # id запросов auth и subscribe, на которые ещё не пришёл ответ
+            pending = set(range(len(CHANNELS) + 1))
+            async for message in ws:
+                if message.type == aiohttp.WSMsgType.TEXT:
+                    self._handle(stream, json_codec.loads(message.data), pending)
+                    if pending is not None and not pending:
+                        stream.connected = True
+                        pending = None
+                        logging.info(f"Аккаунт {account_data['account_index']}: WS подключён, подписки: {', '.join(CHANNELS)}")
+                elif message.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                    break
+
+    @staticmethod
+    def _handle(stream, payload, pending=None):
+        if 'error' in payload:
+            # Ошибка авторизации или подписки - без неё состояние будет неполным
+            raise RuntimeError(f"ошибка WS API: {payload['error']}")
+        if 'result' in payload:
+            # Ответ на auth или subscribe
+            if pending:
+                pending.discard(payload.get('id'))
+            return
+        if payload.get('method') != 'subscription':
+            return
+        params = payload.get('params', {})
+        stream.apply(params.get('channel', ''), params.get('data', {}))
+
+    async def close(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()